@@ -1,3 +1,3 @@
-from .config import ConfigLoader, add_update_conf, view_user_conf
+from .config import ConfigLoader, add_update_conf, view_user_conf, CACHE_DIR
 from .container import container, inject
 
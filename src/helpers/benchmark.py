@@ -0,0 +1,70 @@
+import glob
+import os
+import time
+import tracemalloc
+
+from .extractor import ENGINES, DEFAULT_ENGINE, extract
+
+
+def benchmark_extractors(directory: str, engines: list[str] | None = None, repeat: int = 5) -> list[dict]:
+    """
+        runs every html engine over the saved pages in `directory` and reports pages/sec, peak traced memory
+        and how many pages differ from the default engine's title/text/links
+    """
+    paths = sorted(glob.glob(os.path.join(directory, '**', '*.htm*'), recursive=True))
+
+    if not paths:
+        print(f'No html fixtures found in {directory}')
+        return []
+
+    pages = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+
+    expected = [extract(page, DEFAULT_ENGINE) for page in pages]
+    results = []
+
+    for engine in engines or list(ENGINES):
+        try:
+            extracted = [extract(page, engine) for page in pages]
+        except Exception as e:
+            print(f'*** skipping {engine}: {e} ***')
+            continue
+
+        started = time.perf_counter()
+
+        for _ in range(repeat):
+            for page in pages:
+                extract(page, engine)
+
+        elapsed = time.perf_counter() - started
+
+        # memory is traced in its own pass since tracemalloc skews the timings
+        tracemalloc.start()
+        for page in pages:
+            extract(page, engine)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results.append({
+            'engine': engine,
+            'pages': len(pages) * repeat,
+            'pagesPerSec': len(pages) * repeat / elapsed if elapsed else 0.0,
+            'peakMemoryKb': peak / 1024,
+            'mismatches': sum(1 for got, want in zip(extracted, expected) if got != want)
+        })
+
+    return results
+
+
+def print_results(results: list[dict]) -> None:
+    if not results:
+        return
+
+    columns = list(results[0].keys())
+    print(' | '.join(f'{column:>14}' for column in columns))
+
+    for result in results:
+        print(' | '.join(f'{value:>14.2f}' if isinstance(value, float) else f'{value:>14}'
+                         for value in result.values()))
@@ -0,0 +1,100 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Iterable
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+DEFAULT_K1 = 1.5
+DEFAULT_B = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def idf(document_frequency: int, document_count: int) -> float:
+    """BM25 inverse document frequency, floored at zero by the +1 inside the log"""
+    return math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+
+def term_score(frequency: int, length: int, average_length: float, term_idf: float,
+               k1: float = DEFAULT_K1, b: float = DEFAULT_B) -> float:
+    norm = k1 * (1 - b + b * length / max(average_length, 1e-9))
+    return term_idf * frequency * (k1 + 1) / (frequency + norm)
+
+
+def score_documents(query: str, documents: Iterable[str], k1: float = DEFAULT_K1, b: float = DEFAULT_B) -> list[float]:
+    """
+    BM25 score of every document against the query, using the documents themselves as the corpus.
+    """
+    counts = [Counter(tokenize(document)) for document in documents]
+
+    if not counts:
+        return []
+
+    lengths = [sum(count.values()) for count in counts]
+    average_length = sum(lengths) / len(lengths)
+    terms = set(tokenize(query))
+    frequencies = {term: sum(1 for count in counts if term in count) for term in terms}
+    idfs = {term: idf(frequency, len(counts)) for term, frequency in frequencies.items() if frequency}
+
+    return [
+        sum((term_score(count[term], length, average_length, term_idf, k1, b)
+             for term, term_idf in idfs.items() if term in count), 0.0)
+        for count, length in zip(counts, lengths)
+    ]
+
+
+class BM25Index:
+    """
+    Inverted index (token -> [(document, term frequency)]) scored with BM25.
+    Documents are numbered in insertion order; only postings of the query's tokens are visited per search.
+    """
+
+    def __init__(self, k1: float = DEFAULT_K1, b: float = DEFAULT_B) -> None:
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.lengths: list[int] = []
+
+    def add(self, tokens: Iterable[str]) -> int:
+        document = len(self.lengths)
+        counts = Counter(tokens)
+
+        for term, frequency in counts.items():
+            self.postings.setdefault(term, []).append((document, frequency))
+
+        self.lengths.append(sum(counts.values()))
+        return document
+
+    def search(self, query: str, n: int) -> list[tuple[int, float]]:
+        """Top `n` (document, score) pairs for the query, best first"""
+        if not self.lengths:
+            return []
+
+        average_length = sum(self.lengths) / len(self.lengths)
+        scores: dict[int, float] = {}
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+
+            term_idf = idf(len(postings), len(self.lengths))
+            for document, frequency in postings:
+                scores[document] = scores.get(document, 0.0) + term_score(
+                    frequency, self.lengths[document], average_length, term_idf, self.k1, self.b)
+
+        return heapq.nlargest(n, scores.items(), key=lambda item: item[1])
+
+    def to_dict(self) -> dict:
+        return {'k1': self.k1, 'b': self.b, 'postings': self.postings, 'lengths': self.lengths}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'BM25Index':
+        index = cls(data['k1'], data['b'])
+        index.postings = {term: [tuple(posting) for posting in postings] for term, postings in data['postings'].items()}
+        index.lengths = data['lengths']
+        return index
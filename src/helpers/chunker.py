@@ -1,20 +1,227 @@
-from typing import Iterator
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Iterator, Iterable, NamedTuple
 
+BLOCK_SIZE = 64 * 1024
+DEFAULT_ENCODING = 'cl100k_base'
+# without tiktoken (e.g. the BPE file cannot be downloaded) tokens are estimated at this many characters each
+CHARS_PER_TOKEN = 4
 
-def chunk_file(file_path: str, chunk_size: int, overlap: int) -> Iterator[str]:
-    curr: str = ''
+# a segment ends after sentence punctuation followed by whitespace, or after a run of newlines
+BOUNDARY = re.compile(r'[.!?]+\s+|\n+')
 
-    for line in read_file(file_path):
-        curr += line
 
-        while curr and len(curr) > chunk_size:
-            yield curr[:chunk_size]
-            curr = curr[chunk_size - overlap:]
+class Chunk(NamedTuple):
+    text: str
+    start: int  # utf-8 byte offset of the first character
+    end: int  # utf-8 byte offset just past the last character
+    tokens: int
 
-    yield curr
 
+class Segment(NamedTuple):
+    text: str
+    start: int
+    end: int
+    tokens: int
+    paragraph: bool
 
-def read_file(file_path: str) -> Iterator[str]:
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            yield line
+
+class TokenCounter:
+    def __init__(self, encoding: str = DEFAULT_ENCODING) -> None:
+        try:
+            import tiktoken
+
+            self.encoder = tiktoken.get_encoding(encoding)
+        except Exception as e:
+            print(f'*** tiktoken unavailable, estimating {CHARS_PER_TOKEN} characters per token: {e} ***')
+            self.encoder = None
+
+    def count(self, text: str) -> int:
+        if self.encoder is None:
+            return -(-len(text) // CHARS_PER_TOKEN)
+
+        return len(self.encoder.encode(text, disallowed_special=()))
+
+    def windows(self, text: str, max_tokens: int, overlap: int) -> list[tuple[int, int]]:
+        """
+        Character spans of windows of at most `max_tokens`, for text with no usable boundary. Consecutive windows
+        share `overlap` tokens.
+        """
+        step = max(max_tokens - overlap, 1)
+
+        if self.encoder is None:
+            size, stride = max_tokens * CHARS_PER_TOKEN, step * CHARS_PER_TOKEN
+            return [(i, min(i + size, len(text)))
+                    for i in range(0, max(len(text) - overlap * CHARS_PER_TOKEN, 1), stride)]
+
+        tokens = self.encoder.encode(text, disallowed_special=())
+        _, offsets = self.encoder.decode_with_offsets(tokens)
+        offsets.append(len(text))
+
+        return [(offsets[i], offsets[min(i + max_tokens, len(tokens))])
+                for i in range(0, max(len(tokens) - overlap, 1), step)]
+
+
+@lru_cache(maxsize=4)
+def get_counter(encoding: str = DEFAULT_ENCODING) -> TokenCounter:
+    return TokenCounter(encoding)
+
+
+def _segments(blocks: Iterable[str], counter: TokenCounter) -> Iterator[Segment]:
+    """
+    Cut a stream of text blocks at sentence and paragraph boundaries. Every character is visited a bounded number
+    of times: only the tail after the last boundary is carried into the next block, and a tail without any
+    boundary is flushed once it reaches BLOCK_SIZE.
+    """
+    offset = 0
+    pending = ''
+
+    def segment(text: str) -> Segment:
+        nonlocal offset
+        start = offset
+        offset += len(text.encode('utf-8'))
+        return Segment(text, start, offset, counter.count(text), text.endswith('\n\n'))
+
+    for block in blocks:
+        text = pending + block
+        position = 0
+
+        for match in BOUNDARY.finditer(text):
+            # a boundary touching the end of the text may continue in the next block
+            if match.end() == len(text):
+                break
+            yield segment(text[position:match.end()])
+            position = match.end()
+
+        pending = text[position:]
+
+        if len(pending) >= BLOCK_SIZE:
+            yield segment(pending)
+            pending = ''
+
+    if pending:
+        yield segment(pending)
+
+
+def chunk_stream(blocks: Iterable[str], max_tokens: int = 256, overlap: int = 32,
+                 encoding: str = DEFAULT_ENCODING) -> Iterator[Chunk]:
+    """
+    Pack sentence/paragraph segments into chunks of at most `max_tokens` tokens, repeating up to `overlap` tokens
+    of trailing segments at the start of the next chunk. Chunks end early at a paragraph break once half full.
+    Segments longer than `max_tokens` are split on token windows.
+    """
+    counter = get_counter(encoding)
+    current: deque[Segment] = deque()
+    tokens = 0
+    # segments in `current` that were not part of an emitted chunk yet
+    fresh = 0
+
+    def emit() -> Chunk:
+        return Chunk(''.join(part.text for part in current), current[0].start, current[-1].end, tokens)
+
+    def keep_overlap() -> None:
+        nonlocal tokens, fresh
+        # keep whole trailing segments that fit in the overlap
+        kept = 0
+        retained: deque[Segment] = deque()
+        for part in reversed(current):
+            if kept + part.tokens > overlap:
+                break
+            retained.appendleft(part)
+            kept += part.tokens
+
+        current.clear()
+        current.extend(retained)
+        tokens, fresh = kept, 0
+
+    for part in _segments(blocks, counter):
+        if part.tokens > max_tokens:
+            if fresh:
+                yield emit()
+
+            # advance the byte offset incrementally, the windows are in order
+            char, byte = 0, part.start
+            for window_start, window_end in counter.windows(part.text, max_tokens, overlap):
+                byte += len(part.text[char:window_start].encode('utf-8'))
+                char = window_start
+                piece = part.text[window_start:window_end]
+                yield Chunk(piece, byte, byte + len(piece.encode('utf-8')), counter.count(piece))
+
+            current.clear()
+            tokens, fresh = 0, 0
+            continue
+
+        if fresh and tokens + part.tokens > max_tokens:
+            yield emit()
+            keep_overlap()
+
+        # overlap that leaves no room for the next segment is dropped
+        while current and tokens + part.tokens > max_tokens:
+            tokens -= current.popleft().tokens
+
+        current.append(part)
+        tokens += part.tokens
+        fresh += 1
+
+        if part.paragraph and tokens >= max_tokens // 2:
+            yield emit()
+            keep_overlap()
+
+    if fresh:
+        yield emit()
+
+
+def read_blocks(file_path: str, block_size: int = BLOCK_SIZE) -> Iterator[str]:
+    # newline='' keeps \r\n intact so byte offsets match the file
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        while block := f.read(block_size):
+            yield block
+
+
+def chunk_file(file_path: str, max_tokens: int = 256, overlap: int = 32,
+               encoding: str = DEFAULT_ENCODING) -> Iterator[Chunk]:
+    """Stream a utf-8 file through fixed-size blocks into token sized chunks with byte offsets"""
+    return chunk_stream(read_blocks(file_path), max_tokens, overlap, encoding)
+
+
+def chunk_text(text: str, max_tokens: int = 256, overlap: int = 32, encoding: str = DEFAULT_ENCODING) -> Iterator[Chunk]:
+    return chunk_stream((text[i:i + BLOCK_SIZE] for i in range(0, len(text), BLOCK_SIZE)), max_tokens, overlap,
+                        encoding)
+
+
+def read_chunk(file_path: str, start: int, end: int) -> str:
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        return f.read(end - start).decode('utf-8')
+
+
+def trim_to_tokens(text: str, max_tokens: int, encoding: str = DEFAULT_ENCODING) -> tuple[str, int]:
+    """
+    Longest prefix of `text` made of whole sentence/paragraph segments that fits in `max_tokens`, with its token
+    count. A first segment that is too long on its own is cut on a token boundary instead.
+    """
+    counter = get_counter(encoding)
+    total = counter.count(text)
+
+    if total <= max_tokens:
+        return text, total
+
+    if max_tokens <= 0:
+        return '', 0
+
+    kept: list[str] = []
+    tokens = 0
+
+    for part in _segments((text[i:i + BLOCK_SIZE] for i in range(0, len(text), BLOCK_SIZE)), counter):
+        if tokens + part.tokens > max_tokens:
+            if not kept:
+                start, end = counter.windows(part.text, max_tokens, 0)[0]
+                piece = part.text[start:end]
+                return piece, counter.count(piece)
+            break
+
+        kept.append(part.text)
+        tokens += part.tokens
+
+    return ''.join(kept), tokens
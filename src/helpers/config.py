@@ -9,8 +9,10 @@ from dotenv import load_dotenv
 PROFILE_DIR = Path.home()
 USER_CONFIG_DIR = os.path.join(PROFILE_DIR, '.llms')
 
-if not os.path.exists(USER_CONFIG_DIR):
-    os.makedirs(USER_CONFIG_DIR)
+CACHE_DIR = os.path.join(USER_CONFIG_DIR, 'cache')
+
+if not os.path.exists(CACHE_DIR):
+    os.makedirs(CACHE_DIR)
 
 DEFAULT_CONF_FILE = 'app.json'
 ENV_FILE = '.env'
@@ -72,7 +74,8 @@ def view_user_conf() -> list[str]:
 
     files = os.listdir(USER_CONFIG_DIR)
 
-    file_names = [os.path.splitext(file)[0] for file in files]
+    file_names = [os.path.splitext(file)[0] for file in files
+                  if file.endswith('.json') and os.path.isfile(os.path.join(USER_CONFIG_DIR, file))]
 
     return file_names
 
@@ -0,0 +1,161 @@
+from html.parser import HTMLParser
+from typing import NamedTuple, Callable
+
+from bs4 import BeautifulSoup
+from bs4.dammit import UnicodeDammit
+
+DEFAULT_ENGINE = 'html.parser'
+SKIPPED_TAGS = ('script', 'style', 'img', 'input')
+
+
+class Extraction(NamedTuple):
+    title: str
+    text: str
+    links: list[str]
+
+
+def extract_soup(body: bytes, features: str) -> Extraction:
+    soup = BeautifulSoup(body, features)
+    title = str(soup.title.string or "") if soup.title else "No title found"
+    if soup.body:
+        for irrelevant in soup.body(list(SKIPPED_TAGS)):
+            irrelevant.decompose()
+        text = soup.body.get_text(separator="\n", strip=True)
+    else:
+        text = ""
+    links = [link.get('href') for link in soup.find_all('a')]
+
+    return Extraction(title, text, [link for link in links if link])
+
+
+class StreamExtractor(HTMLParser):
+    """
+        single pass extractor producing the same title/text/links as the BeautifulSoup html.parser engine
+        without building a tree. text runs are flushed on every markup boundary, just like the separate
+        strings BeautifulSoup would create.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.title: str | None = None
+        self.strings: list[str] = []
+        self.links: list[str] = []
+
+        self.__buffer: list[str] = []
+        self.__in_body = False
+        self.__seen_body = False
+        self.__skip_depth = 0
+        self.__in_title = False
+        self.__title_strings: list[str] = []
+        self.__title_tagged = False
+
+    def __flush(self) -> None:
+        if not self.__buffer:
+            return
+
+        string = ''.join(self.__buffer)
+        self.__buffer = []
+
+        if self.__in_title:
+            self.__title_strings.append(string)
+
+        if self.__in_body and not self.__skip_depth:
+            string = string.strip()
+            if string:
+                self.strings.append(string)
+
+    def __end_title(self) -> None:
+        # BeautifulSoup only exposes title.string when the title holds exactly one string
+        self.__in_title = False
+        self.title = self.__title_strings[0] \
+            if len(self.__title_strings) == 1 and not self.__title_tagged else ''
+
+    def __add_link(self, attrs: list[tuple[str, str | None]]) -> None:
+        href = dict(attrs).get('href')
+        if href:
+            self.links.append(href)
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.__flush()
+
+        if self.__in_title:
+            self.__title_tagged = True
+
+        if tag == 'body' and not self.__seen_body:
+            self.__seen_body = True
+            self.__in_body = True
+        elif tag == 'title' and self.title is None and not self.__in_title:
+            self.__in_title = True
+        elif tag in ('script', 'style') and self.__in_body:
+            self.__skip_depth += 1
+        elif tag == 'a':
+            self.__add_link(attrs)
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.__flush()
+
+        if self.__in_title:
+            self.__title_tagged = True
+
+        if tag == 'a':
+            self.__add_link(attrs)
+
+    def handle_endtag(self, tag: str) -> None:
+        self.__flush()
+
+        if tag == 'body' and self.__in_body:
+            self.__in_body = False
+        elif tag == 'title' and self.__in_title:
+            self.__end_title()
+        elif tag in ('script', 'style') and self.__skip_depth:
+            self.__skip_depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        self.__buffer.append(data)
+
+    def handle_comment(self, data: str) -> None:
+        self.__flush()
+
+    def handle_decl(self, decl: str) -> None:
+        self.__flush()
+
+    def handle_pi(self, data: str) -> None:
+        self.__flush()
+
+    def unknown_decl(self, data: str) -> None:
+        self.__flush()
+
+        if data.startswith('CDATA['):
+            self.__buffer.append(data[len('CDATA['):])
+            self.__flush()
+
+    def close(self) -> None:
+        super().close()
+        self.__flush()
+
+        if self.__in_title:
+            self.__end_title()
+
+
+def extract_stream(body: bytes) -> Extraction:
+    parser = StreamExtractor()
+    parser.feed(UnicodeDammit(body, is_html=True).unicode_markup or '')
+    parser.close()
+
+    title = "No title found" if parser.title is None else parser.title
+
+    return Extraction(title, "\n".join(parser.strings), parser.links)
+
+
+ENGINES: dict[str, Callable[[bytes], Extraction]] = {
+    'html.parser': lambda body: extract_soup(body, 'html.parser'),
+    'lxml': lambda body: extract_soup(body, 'lxml'),
+    'stream': extract_stream,
+}
+
+
+def extract(body: bytes, engine: str = DEFAULT_ENGINE) -> Extraction:
+    if engine not in ENGINES:
+        raise ValueError(f'unknown html engine {engine}, expected one of {list(ENGINES)}')
+
+    return ENGINES[engine](body)
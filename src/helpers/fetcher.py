@@ -0,0 +1,87 @@
+import threading
+from typing import NamedTuple, Mapping
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 20
+MAX_BODY_BYTES = 5 * 1024 * 1024
+MAX_PER_HOST = 4
+POOL_SIZE = 32
+TEXT_CONTENT_TYPES = ('text/', 'application/xhtml', 'application/xml')
+
+
+class FetchError(Exception):
+    pass
+
+
+class FetchResult(NamedTuple):
+    url: str
+    status: int
+    content: bytes
+    headers: Mapping[str, str]
+
+
+class Fetcher:
+    """
+        thread safe http client shared by every page fetch.
+
+        connections are kept alive in one pool, each host gets at most `max_per_host` requests in flight,
+        bodies larger than `max_body_bytes` are aborted mid-download and non text responses are never read.
+    """
+
+    def __init__(self, headers: dict[str, str], pool_size: int = POOL_SIZE, max_per_host: int = MAX_PER_HOST,
+                 timeout: tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+                 max_body_bytes: int = MAX_BODY_BYTES) -> None:
+        self.timeout = timeout
+        self.max_body_bytes = max_body_bytes
+        self.max_per_host = max_per_host
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.__lock = threading.Lock()
+        self.__hosts: dict[str, threading.BoundedSemaphore] = {}
+
+    def __host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc.lower()
+
+        with self.__lock:
+            if host not in self.__hosts:
+                self.__hosts[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self.__hosts[host]
+
+    def __read_body(self, response: requests.Response) -> bytes:
+        content_length = response.headers.get('Content-Length')
+
+        if content_length and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            raise FetchError(f'{response.url} is {content_length} bytes, over the {self.max_body_bytes} limit')
+
+        body = bytearray()
+
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            body += chunk
+            if len(body) > self.max_body_bytes:
+                raise FetchError(f'{response.url} exceeded the {self.max_body_bytes} byte limit')
+
+        return bytes(body)
+
+    def get(self, url: str, headers: dict[str, str] | None = None) -> FetchResult:
+        with self.__host_semaphore(url):
+            with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 304:
+                    return FetchResult(response.url, response.status_code, b'', response.headers)
+
+                response.raise_for_status()
+
+                content_type = response.headers.get('Content-Type', 'text/html').lower()
+                if not content_type.startswith(TEXT_CONTENT_TYPES):
+                    raise FetchError(f'{url} is {content_type}, skipping')
+
+                return FetchResult(response.url, response.status_code, self.__read_body(response),
+                                   response.headers)
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, TypeVar
+
+V = TypeVar('V')
+
+MISSING = object()
+
+
+class LRUCache(Generic[V]):
+    """
+    Thread safe in-process LRU cache with an optional time to live (seconds) per entry.
+    With `max_size` set, entries are also evicted until the summed `sizeof` of the values fits.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float | None = None, max_size: int | None = None,
+                 sizeof: Callable[[V], int] = len) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.__entries: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __remove(self, key: Hashable) -> tuple[float, V] | None:
+        entry = self.__entries.pop(key, None)
+        if entry is not None and self.max_size is not None:
+            self.size -= self.sizeof(entry[1])
+        return entry
+
+    def get(self, key: Hashable, default=None) -> V | None:
+        with self.__lock:
+            entry = self.__entries.get(key, MISSING)
+
+            if entry is not MISSING and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                self.__remove(key)
+                entry = MISSING
+
+            if entry is MISSING:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self.__entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, value: V) -> None:
+        with self.__lock:
+            self.__remove(key)
+            self.__entries[key] = (time.monotonic(), value)
+            if self.max_size is not None:
+                self.size += self.sizeof(value)
+
+            while len(self.__entries) > self.max_entries or \
+                    (self.max_size is not None and self.size > self.max_size and len(self.__entries) > 1):
+                self.__remove(next(iter(self.__entries)))
+
+    def pop(self, key: Hashable) -> V | None:
+        with self.__lock:
+            entry = self.__remove(key)
+            return entry[1] if entry else None
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+
+        return {
+            'entries': len(self.__entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import TypedDict, Required
+
+from .config import CACHE_DIR
+
+DEFAULT_TTL = 60 * 60
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class CachedPage(TypedDict):
+    url: Required[str]
+    etag: Required[str]
+    lastModified: Required[str]
+    fetchedAt: Required[float]
+    body: Required[bytes]
+    title: Required[str]
+    text: Required[str]
+    links: Required[list[str]]
+
+
+class PageCache:
+    """
+        sqlite backed cache of fetched pages, keyed by url.
+
+        pages younger than `ttl` seconds are served without touching the network, older pages are revalidated
+        with their ETag/Last-Modified validators. once the cache grows past `max_bytes` the least recently
+        used pages are evicted. PAGE_CACHE_TTL and PAGE_CACHE_MAX_BYTES override the defaults.
+
+        fresh hits are counted by get, revalidations by touch and misses by put, all under the cache lock since
+        pages are loaded from worker threads.
+    """
+
+    def __init__(self, path: str = os.path.join(CACHE_DIR, 'pages.sqlite'), ttl: int | None = None,
+                 max_bytes: int | None = None) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+        self.__lock = threading.Lock()
+        self.__connection: sqlite3.Connection | None = None
+
+    def __connect(self) -> sqlite3.Connection:
+        if self.__connection:
+            return self.__connection
+
+        # settings are resolved on first use so values loaded from .env are picked up
+        if self.ttl is None:
+            self.ttl = int(os.getenv('PAGE_CACHE_TTL', DEFAULT_TTL))
+        if self.max_bytes is None:
+            self.max_bytes = int(os.getenv('PAGE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+
+        self.__connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.__connection.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL,
+                last_access REAL,
+                size INTEGER,
+                body BLOB,
+                title TEXT,
+                text TEXT,
+                links TEXT
+            )""")
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)")
+        self.__connection.commit()
+
+        return self.__connection
+
+    def get(self, url: str) -> CachedPage | None:
+        with self.__lock:
+            connection = self.__connect()
+            row = connection.execute(
+                "SELECT url, etag, last_modified, fetched_at, body, title, text, links FROM pages WHERE url = ?",
+                (url,)).fetchone()
+
+            if not row:
+                return None
+
+            connection.execute("UPDATE pages SET last_access = ? WHERE url = ?", (time.time(), url))
+            connection.commit()
+
+            # stale pages are counted by touch (revalidated) or put (refetched)
+            if time.time() - row[3] < self.ttl:
+                self.hits += 1
+
+        return {
+            'url': row[0],
+            'etag': row[1],
+            'lastModified': row[2],
+            'fetchedAt': row[3],
+            'body': row[4],
+            'title': row[5],
+            'text': row[6],
+            'links': json.loads(row[7])
+        }
+
+    def is_fresh(self, page: CachedPage) -> bool:
+        self.__connect()
+        return time.time() - page['fetchedAt'] < self.ttl
+
+    def put(self, page: CachedPage) -> None:
+        links = json.dumps(page['links'])
+        size = len(page['body']) + len(page['text'].encode()) + len(page['title'].encode()) + len(links)
+        now = time.time()
+
+        with self.__lock:
+            connection = self.__connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (page['url'], page['etag'], page['lastModified'], page['fetchedAt'], now, size, page['body'],
+                 page['title'], page['text'], links))
+            self.__evict(connection)
+            connection.commit()
+            self.misses += 1
+
+    def touch(self, url: str) -> None:
+        """
+            marks a page as freshly validated after a 304 response
+        """
+        with self.__lock:
+            connection = self.__connect()
+            now = time.time()
+            connection.execute("UPDATE pages SET fetched_at = ?, last_access = ? WHERE url = ?", (now, now, url))
+            connection.commit()
+            self.revalidations += 1
+
+    def __evict(self, connection: sqlite3.Connection) -> None:
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+        if total <= self.max_bytes:
+            return
+
+        for url, size in connection.execute("SELECT url, size FROM pages ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            connection.execute("DELETE FROM pages WHERE url = ?", (url,))
+            total -= size
+
+    def stats(self) -> dict[str, int | float]:
+        with self.__lock:
+            hits, revalidations, misses = self.hits, self.revalidations, self.misses
+
+        lookups = hits + revalidations + misses
+
+        return {
+            'hits': hits,
+            'revalidations': revalidations,
+            'misses': misses,
+            'hitRate': (hits + revalidations) / lookups if lookups else 0.0
+        }
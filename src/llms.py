@@ -1,4 +1,8 @@
+import multiprocessing
+
 from llms.__main__ import main
 
 if __name__ == '__main__':
+    # ingest workers of a frozen (PyInstaller) binary re-run this entry point on spawn platforms
+    multiprocessing.freeze_support()
     main()
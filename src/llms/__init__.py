@@ -6,5 +6,7 @@ from .main import (
     add_config,
     list_config,
     interactive,
-    chat_bot)
+    chat_bot,
+    bench_parser,
+    bench_index)
 
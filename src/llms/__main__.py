@@ -9,9 +9,14 @@ from llms import (
     add_config,
     list_config,
     interactive,
-    chat_bot)
+    chat_bot,
+    bench_parser,
+    bench_index)
+
+from llms.core import Tournament
 
 from helpers import view_user_conf
+from helpers.extractor import ENGINES
 
 providers: list[str] = ['-'] + view_user_conf()
 
@@ -43,6 +48,13 @@ def main() -> int:
     battle_parser.add_argument("-f", "--firstMessage", type=str, default='Hello', nargs="?")
     battle_parser.add_argument("-nob", "--numberOfBattles", type=int, default=5, nargs="?")
     battle_parser.add_argument("-m", "--models", nargs="+", help=f"list of {providers}")
+    battle_parser.add_argument("-T", "--tournament", action="store_true",
+                               help="battle every pairing of the given models concurrently")
+    battle_parser.add_argument("--pairing", choices=Tournament.PAIRINGS, default='all',
+                               help="'all' for every pairing, 'bracket' for one battle per model")
+    battle_parser.add_argument("-c", "--concurrency", type=int, default=4, help="max battles running at once")
+    battle_parser.add_argument("-o", "--output", type=str, default='tournament.jsonl',
+                               help="jsonl transcript of the tournament")
     battle_parser.set_defaults(func=battle_sim)
 
     add_config_parser = subparsers.add_parser('addConfig', help='add config to llm')
@@ -58,6 +70,23 @@ def main() -> int:
     interactive_parser = subparsers.add_parser('chatBot', help='use gradio to create interactive chat bot')
     interactive_parser.set_defaults(func=chat_bot)
 
+    bench_parser_parser = subparsers.add_parser('benchParser', help='benchmark html extraction engines')
+    bench_parser_parser.add_argument("directory", type=str, default='benchmarks/fixtures', nargs="?",
+                                     help="directory of saved html pages")
+    bench_parser_parser.add_argument("-e", "--engines", nargs="+", choices=list(ENGINES))
+    bench_parser_parser.add_argument("-r", "--repeat", type=int, default=5, nargs="?")
+    bench_parser_parser.set_defaults(func=bench_parser)
+
+    bench_index_parser = subparsers.add_parser('benchIndex', help='benchmark vector index strategies')
+    bench_index_parser.add_argument("-i", "--indexes", nargs="+",
+                                    default=['hnsw:m=16,efConstruction=64', 'ivfflat:lists=100'],
+                                    help="index specs, e.g. hnsw:m=16,efSearch=40 ivfflat:lists=100,probes=10")
+    bench_index_parser.add_argument("-k", type=int, default=10, help="neighbours compared for recall@k")
+    bench_index_parser.add_argument("-n", "--sample", type=int, default=100,
+                                    help="stored embeddings sampled as queries")
+    bench_index_parser.add_argument("-q", "--queries", type=str, help="file of query texts, one per line")
+    bench_index_parser.set_defaults(func=bench_index)
+
     args = parser.parse_args()
 
     if hasattr(args, 'func'):
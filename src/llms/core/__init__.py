@@ -3,3 +3,4 @@ from .brochure_maker import BrochureMaker
 from .joker import Joker
 from .tool_box import ToolBox
 from .battle_sim import BattleSim
+from .tournament import Tournament
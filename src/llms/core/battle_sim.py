@@ -1,14 +1,40 @@
+import time
+import uuid
+
 from helpers import inject
-from llms.core.classes import Model
+from llms.core.classes import Model, BattleTurn
+
+
+def create_model(provider: str) -> Model:
+    key = f'{'default' if provider == '-' else provider}-{str(uuid.uuid4())[3::4]}'
+
+    return {
+        'provider': provider,
+        'key': key,
+        'response': ''
+    }
+
 
 @inject(provider_factory='provider_factory')
 class BattleSim:
-    def __init__(self, models: list[Model]) -> None:
+    def __init__(self, models: list[Model], name: str = 'LLM BATTLE') -> None:
         self.MODELS: list[Model] = models
+        self.name: str = name
+        self.transcript: list[BattleTurn] = []
 
-        print(f'\n***** LLM BATTLE *****\n')
+        print(f'\n***** {name} *****\n')
 
-    def start(self, number_of_interactions: int, first_message: str) -> None:
+    def __record(self, interaction: int, model: Model, message: str, latency: float) -> None:
+        self.transcript.append({
+            'battle': self.name,
+            'interaction': interaction,
+            'key': model['key'],
+            'provider': model['provider'],
+            'message': message,
+            'latency': latency
+        })
+
+    async def start(self, number_of_interactions: int, first_message: str) -> list[BattleTurn]:
         for interaction in range(number_of_interactions):
             for i, model in enumerate(self.MODELS):
                 key = model['key']
@@ -16,7 +42,8 @@ class BattleSim:
 
                 if interaction == 0 and i == 0 and first_message:
                     print(f'\n{key.upper()}:\n{first_message}\n')
-                    self.provider_factory.get(provider, key=key).update_messages(assistant_message=first_message)
+                    await self.provider_factory.get(provider, key=key).update_messages(assistant_message=first_message)
+                    self.__record(interaction, model, first_message, 0.0)
 
                 user_messages = [other_model['response']
                                  for j, other_model in enumerate(self.MODELS)
@@ -24,16 +51,28 @@ class BattleSim:
 
                 for user_message in user_messages:
                     if user_message:
-                        self.provider_factory.get(provider, key=key).update_messages(user_message=user_message)
+                        await self.provider_factory.get(provider, key=key).update_messages(user_message=user_message)
 
+                started = time.perf_counter()
                 response = self.provider_factory.get(provider, key=key).make_assistant_request()
 
                 parsed_response: str = ''
 
-                for info in response:
+                async for info in response:
                     parsed_response += info
 
+                self.__record(interaction, model, parsed_response, time.perf_counter() - started)
+
                 print(f'\n{key.upper()}:\n{parsed_response}\n')
-                self.provider_factory.get(provider, key=key).update_messages(assistant_message=parsed_response, assistant_thread=True)
+                await self.provider_factory.get(provider, key=key).update_messages(assistant_message=parsed_response, assistant_thread=True)
 
                 self.MODELS.__setitem__(i, model | {'response': parsed_response})
+
+        return self.transcript
+
+    def release(self) -> None:
+        """
+        drops this battle's providers from the factory so finished battles do not keep their histories alive
+        """
+        for model in self.MODELS:
+            self.provider_factory.pop(model['key'], None)
@@ -1,4 +1,4 @@
-from typing import Iterator
+from typing import AsyncIterator
 
 from helpers import inject
 
@@ -21,8 +21,8 @@ class BrochureMaker:
     {details}
     """
 
-    def create_brochure(self, model: str, tone: str, title: str, details: str, stream: bool = False) \
-            -> Iterator[str]:
+    async def create_brochure(self, model: str, tone: str, title: str, details: str, stream: bool = False) \
+            -> AsyncIterator[str]:
         """
             creates an AI generated markdown brochure using self.TONE and self.REQUEST
 
@@ -43,7 +43,8 @@ class BrochureMaker:
 
         parsed_response = ''
 
-        for chunk in brochure_response:
+        async for chunk in brochure_response:
             parsed_response += chunk
 
-        yield from map(lambda x: x.replace("markdown", ""), parsed_response)
+        for chunk in map(lambda x: x.replace("markdown", ""), parsed_response):
+            yield chunk
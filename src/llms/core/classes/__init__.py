@@ -1,2 +1,3 @@
 from .website import Website
-from .model import Model
+from .model import Model, BattleTurn
+from .tool_result import ToolResult
@@ -5,3 +5,12 @@ class Model(TypedDict):
     provider: Required[str]
     key: Required[str]
     response: NotRequired[str]
+
+
+class BattleTurn(TypedDict):
+    battle: Required[str]
+    interaction: Required[int]
+    key: Required[str]
+    provider: Required[str]
+    message: Required[str]
+    latency: Required[float]
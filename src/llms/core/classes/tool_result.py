@@ -0,0 +1,6 @@
+from typing import TypedDict, Required
+
+
+class ToolResult(TypedDict):
+    content: Required[str]
+    cached: Required[bool]
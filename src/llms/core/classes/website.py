@@ -1,12 +1,18 @@
-from bs4 import BeautifulSoup
-import requests
-from requests import Response
+import os
+import time
+
+from helpers.extractor import extract, DEFAULT_ENGINE
+from helpers.fetcher import Fetcher
+from helpers.page_cache import PageCache, CachedPage
 
 headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 "
                   "Safari/537.36"
 }
 
+fetcher = Fetcher(headers)
+page_cache = PageCache()
+
 class Website:
     """
     A utility class to represent a Website that we have scraped, now with links.
@@ -19,25 +25,54 @@ class Website:
         self.links: list[str]
 
         try:
-            response = requests.get(url, headers=headers)
-            self.__parse_website(response)
+            self.__load(url)
         except Exception as e:
+            print(f'*** unable to fetch {url}: {e} ***')
             self.title = ""
             self.text = ""
             self.links = []
 
-    def __parse_website(self, response: Response):
-        self.body = response.content
-        soup = BeautifulSoup(self.body, 'html.parser')
-        self.title = soup.title.string if soup.title else "No title found"
-        if soup.body:
-            for irrelevant in soup.body(["script", "style", "img", "input"]):
-                irrelevant.decompose()
-            self.text = soup.body.get_text(separator="\n", strip=True)
-        else:
-            self.text = ""
-        links = [link.get('href') for link in soup.find_all('a')]
-        self.links = [link for link in links if link]
+    def __load(self, url: str):
+        cached = page_cache.get(url)
+
+        if cached and page_cache.is_fresh(cached):
+            self.__restore(cached)
+            return
+
+        conditional_headers = {}
+        if cached and cached['etag']:
+            conditional_headers['If-None-Match'] = cached['etag']
+        if cached and cached['lastModified']:
+            conditional_headers['If-Modified-Since'] = cached['lastModified']
+
+        response = fetcher.get(url, headers=conditional_headers)
+
+        if response.status == 304 and cached:
+            page_cache.touch(url)
+            self.__restore(cached)
+            return
+
+        self.__parse_website(response.content)
+        page_cache.put({
+            'url': url,
+            'etag': response.headers.get('ETag', ''),
+            'lastModified': response.headers.get('Last-Modified', ''),
+            'fetchedAt': time.time(),
+            'body': self.body,
+            'title': self.title,
+            'text': self.text,
+            'links': self.links
+        })
+
+    def __restore(self, page: CachedPage):
+        self.body = page['body']
+        self.title = page['title']
+        self.text = page['text']
+        self.links = page['links']
+
+    def __parse_website(self, body: bytes):
+        self.body = body
+        self.title, self.text, self.links = extract(body, os.getenv('HTML_ENGINE', DEFAULT_ENGINE))
 
     def get_contents(self):
         return f"Webpage Title:\n{self.title}\nWebpage Contents:\n{self.text}\n\n"
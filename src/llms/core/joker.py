@@ -1,4 +1,4 @@
-from typing import Iterator
+from typing import AsyncIterator
 
 from helpers import inject
 
@@ -16,7 +16,7 @@ class Joker:
     Tell a {joke_type} joke for an audience of {audience}.
     """
 
-    def tell_joke(self, model: str, tone: str, joke_type: str, audience: str) -> Iterator[str]:
+    async def tell_joke(self, model: str, tone: str, joke_type: str, audience: str) -> AsyncIterator[str]:
         """
         :return: -> str the joke
         """
@@ -24,4 +24,5 @@ class Joker:
         tone = f"{self.TONE} {tone}" if tone else self.TONE
         request = self.REQUEST.replace('{joke_type}', joke_type).replace('{audience}', audience)
 
-        yield provider.make_request(system_message=tone, request=request)
+        async for chunk in provider.make_request(system_message=tone, request=request):
+            yield chunk
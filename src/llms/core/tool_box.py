@@ -1,63 +1,75 @@
+import asyncio
 import json
 
-from llms.core.classes import Website
+from llms.core.classes import Website, ToolResult
 from llms.core import WebScanner, BrochureMaker, Joker
 
 from helpers import inject, view_user_conf
+from helpers.lru_cache import LRUCache
 
 models = ['-'] + view_user_conf()
 
+DEFAULT_TOOL_TIMEOUT = 30
+
 
 @inject(provider_factory='provider_factory')
 class ToolBox:
+    def __init__(self) -> None:
+        self.__results: dict[str, LRUCache[str]] = {
+            name: LRUCache(max_entries=policy['maxEntries'], ttl=policy['ttl'], max_size=policy['maxBytes'],
+                           sizeof=lambda result: len(result.encode('utf-8')))
+            for name, policy in self.__cache_policies.items()
+        }
+        self.__in_flight: dict[tuple[str, str], asyncio.Task] = {}
+
     __ticket_prices = {"london": "$799", "paris": "$899", "tokyo": "$1400", "berlin": "$499"}
 
-    def get_ticket_price(self, destination_city: str) -> str:
+    async def get_ticket_price(self, destination_city: str) -> str:
         print(f'*** getting ticket price for {destination_city} ***')
         city = destination_city.lower()
         return self.__ticket_prices.get(city, "Unknown")
 
-    def scan_website(self, model: str, url: str) -> str:
+    async def scan_website(self, model: str, url: str) -> str:
         print(f'*** scanning {url} with {model} ***')
-        website = Website(url)
+        website = await asyncio.to_thread(Website, url)
         web_scanner = WebScanner()
-        scan_results = web_scanner.scan_website(model, website)
+        scan_results = await web_scanner.scan_website(model, website)
         return scan_results
 
-    def create_brochure(self, model: str, url: str, tone: str = None) -> str:
+    async def create_brochure(self, model: str, url: str, tone: str = None) -> str:
         print(f'*** creating brochure for {url} with {model} and tone {tone} ***')
-        website = Website(url)
+        website = await asyncio.to_thread(Website, url)
         web_scanner = WebScanner()
         brochure_maker = BrochureMaker()
 
-        scan_results = web_scanner.scan_website(model, website)
+        scan_results = await web_scanner.scan_website(model, website)
         brochure = brochure_maker.create_brochure(model, tone, website.title, scan_results)
 
         result = ''
-        for chunk in brochure:
+        async for chunk in brochure:
             result += chunk
 
         return result
 
-    def simple_request(self, model: str, request: str) -> str:
+    async def simple_request(self, model: str, request: str) -> str:
         print(f'*** asking {request} to {model} ***')
         provider = self.provider_factory.get(model)
         response = provider.make_request(request=request)
 
         result = ''
-        for value in response:
+        async for value in response:
             result += value
 
         return result
 
 
-    def tell_joke(self, model: str, joke_type: str, audience: str, tone: str = None) -> str:
+    async def tell_joke(self, model: str, joke_type: str, audience: str, tone: str = None) -> str:
         print(f'*** telling a {joke_type} joke to {audience} with an {tone} tone ***')
         joker = Joker()
-        response = joker.tell_joke(model, joke_type, audience, tone)
+        response = joker.tell_joke(model, tone=tone, joke_type=joke_type, audience=audience)
 
         result = ''
-        for value in response:
+        async for value in response:
             result += value
 
         return result
@@ -197,6 +209,21 @@ class ToolBox:
         "tell_joke": tell_joke,
     }
 
+    # seconds a tool call may take, tools that scrape pages and call models get longer
+    __timeouts = {
+        "simple_request": 90,
+        "scan_website": 180,
+        "create_brochure": 300,
+        "tell_joke": 90,
+    }
+
+    # results of deterministic, expensive tools are reused for `ttl` seconds; jokes and free-form requests are not cached
+    __cache_policies = {
+        "get_ticket_price": {"ttl": 3600, "maxEntries": 256, "maxBytes": 64 * 1024},
+        "scan_website": {"ttl": 1800, "maxEntries": 64, "maxBytes": 8 * 1024 * 1024},
+        "create_brochure": {"ttl": 1800, "maxEntries": 32, "maxBytes": 8 * 1024 * 1024},
+    }
+
     __tools = [
         {
             "type": "function",
@@ -223,12 +250,44 @@ class ToolBox:
     def get_tools(self):
         return self.__tools
 
-    def handle_tool_call(self, function: str, args: str) -> str:
+    def get_timeout(self, function: str) -> float:
+        return self.__timeouts.get(function, DEFAULT_TOOL_TIMEOUT)
+
+    def cache_stats(self) -> dict[str, dict[str, int | float]]:
+        return {name: cache.stats() for name, cache in self.__results.items()}
+
+    async def __run(self, function: str, key: str, arguments: dict) -> str:
+        try:
+            result = await self.__functions[function](self, **arguments)
+            # empty results are usually a failed scrape, let the next call retry
+            if result:
+                self.__results[function].put(key, result)
+            return result
+        finally:
+            self.__in_flight.pop((function, key), None)
+
+    async def handle_tool_call(self, function: str, args: str) -> ToolResult:
         if function not in self.__functions:
-            return ''
+            return {'content': '', 'cached': False}
 
         arguments = json.loads(args)
 
-        tool_response = self.__functions[function](self, **arguments)
+        if function not in self.__results:
+            return {'content': await self.__functions[function](self, **arguments), 'cached': False}
+
+        # canonical arguments, so key order and whitespace in the model's JSON do not matter
+        key = json.dumps(arguments, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        cached = self.__results[function].get(key)
+
+        if cached is not None:
+            return {'content': cached, 'cached': True}
+
+        # identical concurrent calls share one run; shield keeps it alive when a waiter times out
+        task = self.__in_flight.get((function, key))
+        joined = task is not None
+
+        if not joined:
+            task = asyncio.ensure_future(self.__run(function, key, arguments))
+            self.__in_flight[(function, key)] = task
 
-        return tool_response
+        return {'content': await asyncio.shield(task), 'cached': joined}
@@ -0,0 +1,107 @@
+import asyncio
+import itertools
+import json
+import time
+
+from llms.core.battle_sim import BattleSim, create_model
+from llms.core.classes import BattleTurn
+
+
+class Tournament:
+    """
+        Runs many independent battles between provider configs at once.
+
+        every battle gets freshly keyed providers so no conversation history is shared between pairings,
+        and at most `concurrency` battles are in flight at any time. providers of the same config share one
+        knowledge base (see ProviderFactory), so concurrent battles never ingest the same table twice.
+    """
+
+    PAIRINGS = ['all', 'bracket']
+
+    def __init__(self, providers: list[str], pairing: str = 'all', concurrency: int = 4) -> None:
+        if pairing not in self.PAIRINGS:
+            raise ValueError(f'unknown pairing {pairing}, expected one of {self.PAIRINGS}')
+
+        self.providers: list[str] = providers
+        self.pairing: str = pairing
+        self.concurrency: int = max(concurrency, 1)
+        self.latencies: dict[str, float] = {}
+        self.turns: dict[str, int] = {}
+
+    def pairings(self) -> list[tuple[str, str]]:
+        """
+            'all' pairs every provider with every other provider once,
+            'bracket' pairs neighbours so each provider fights exactly once (an odd one out gets a bye)
+        """
+        if self.pairing == 'bracket':
+            pairs = list(zip(self.providers[::2], self.providers[1::2]))
+
+            if len(self.providers) % 2:
+                print(f'*** {self.providers[-1]} gets a bye ***')
+
+            return pairs
+
+        return list(itertools.combinations(self.providers, 2))
+
+    async def __run_battle(self, semaphore: asyncio.Semaphore, pair: tuple[str, str], number: int,
+                           number_of_interactions: int, first_message: str) -> list[BattleTurn]:
+        async with semaphore:
+            battle = BattleSim([create_model(provider) for provider in pair],
+                               name=f'BATTLE {number}: {' vs '.join(pair)}')
+
+            try:
+                return await battle.start(number_of_interactions, first_message)
+            except Exception as e:
+                print(f'\nError running battle {number} {pair}: {e}\n')
+                return battle.transcript
+            finally:
+                battle.release()
+
+    async def start(self, number_of_interactions: int, first_message: str, output: str) -> dict:
+        pairs = self.pairings()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        print(f'\n***** LLM TOURNAMENT: {len(pairs)} battles, {self.concurrency} at a time *****\n')
+
+        started = time.perf_counter()
+        transcripts = await asyncio.gather(*[
+            self.__run_battle(semaphore, pair, number, number_of_interactions, first_message)
+            for number, pair in enumerate(pairs, start=1)
+        ])
+        wall_clock = time.perf_counter() - started
+
+        for turn in itertools.chain.from_iterable(transcripts):
+            if turn['latency'] <= 0:
+                continue
+            self.latencies[turn['provider']] = self.latencies.get(turn['provider'], 0.0) + turn['latency']
+            self.turns[turn['provider']] = self.turns.get(turn['provider'], 0) + 1
+
+        summary = {
+            'type': 'summary',
+            'battles': len(pairs),
+            'concurrency': self.concurrency,
+            'wallClock': wall_clock,
+            'latencies': self.latencies,
+            'turns': self.turns
+        }
+
+        with open(output, 'w', encoding='utf-8') as f:
+            for turn in itertools.chain.from_iterable(transcripts):
+                f.write(json.dumps({'type': 'turn', **turn}) + '\n')
+            f.write(json.dumps(summary) + '\n')
+
+        self.print_summary(summary, output)
+
+        return summary
+
+    @staticmethod
+    def print_summary(summary: dict, output: str) -> None:
+        print(f'\n***** TOURNAMENT COMPLETE *****\n')
+        print(f'battles: {summary['battles']}')
+        print(f'wall clock: {summary['wallClock']:.2f}s')
+
+        for provider, latency in sorted(summary['latencies'].items(), key=lambda item: item[1]):
+            turns = summary['turns'][provider]
+            print(f'{provider}: {latency:.2f}s total over {turns} turns ({latency / turns:.2f}s avg)')
+
+        print(f'transcript written to {output}')
@@ -1,9 +1,11 @@
+import asyncio
 import json
 
 from helpers import inject
 from llms.core.classes import Website
+from llms.core.classes.website import page_cache
 
-def process_links(links: dict) -> str:
+async def process_links(links: dict) -> str:
     """
         processes a json object in the following format:
             {
@@ -15,22 +17,20 @@ def process_links(links: dict) -> str:
                 ]
             }
 
-        this method uses the urls for all links and fetches the webdata,
-        compiles it into a string, and returns said string
+        this method fetches the webdata for all link urls concurrently over the shared connection pool,
+        compiles it into a string in the original link order, and returns said string
     """
 
     if not links or 'links' not in links:
         return ''
 
-    link_content: str = ''
+    valid_links = [link for link in links['links'] if 'url' in link and isinstance(link['url'], str)]
 
-    for link in links['links']:
-        if 'url' not in link or not isinstance(link['url'], str):
-            continue
+    link_websites = await asyncio.gather(*[asyncio.to_thread(Website, link['url']) for link in valid_links])
 
-        link_url = link['url']
+    link_content: str = ''
 
-        link_website = Website(link_url)
+    for link, link_website in zip(valid_links, link_websites):
         link_content += f"""
             {link}
             {link_website.get_contents()}
@@ -68,7 +68,7 @@ class WebScanner:
     {links}
     """
 
-    def scan_website(self, model: str, website: Website) -> str:
+    async def scan_website(self, model: str, website: Website) -> str:
         """
         scans a given website using AI and returns details on each important link as a string
 
@@ -91,12 +91,12 @@ class WebScanner:
         links = ''
 
         try:
-            for chunk in scan_results:
+            async for chunk in scan_results:
                 links_str += chunk
 
-            links = process_links(json.loads(links_str))
+            links = await process_links(json.loads(links_str))
         except Exception as e:
             print("\nError parsing link scan results: {}\n".format(e))
 
-        print(f'*** scan complete ***')
+        print(f'*** scan complete (page cache: {page_cache.stats()}) ***')
         return f"{website.title}  {website.get_contents()}  {links}"
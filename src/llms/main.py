@@ -1,13 +1,18 @@
 from argparse import Namespace
-import uuid
-from llms.core import ToolBox, BattleSim
+import asyncio
+from llms.core import ToolBox, BattleSim, Tournament
+from llms.core.battle_sim import create_model
 from llms.core.classes import Model
 from llms.service import (display_markdown,
                           create_request_display,
                           create_chat_display)
+from llms.service.kbase import VectorService, MMapVectorService
+from llms.service.kbase.index_benchmark import benchmark_indexes
+from llms.service.kbase.vector_index import parse_index_spec
 from llms.provider import ProviderFactory
 
 from helpers import ConfigLoader, add_update_conf, view_user_conf, container
+from helpers.benchmark import benchmark_extractors, print_results
 
 """
 instantiate dependencies
@@ -23,7 +28,7 @@ container.register('tool_box', tool_box)
 
 
 def create_brochure(args: Namespace) -> None:
-    brochure = tool_box.create_brochure(args.provider, args.url, args.tone)
+    brochure = asyncio.run(tool_box.create_brochure(args.provider, args.url, args.tone))
 
     display_markdown(brochure.replace("```", ""))
 
@@ -31,7 +36,7 @@ def create_brochure(args: Namespace) -> None:
 
 
 def simple_request(args: Namespace) -> None:
-    response = tool_box.simple_request(args.tone, args.request)
+    response = asyncio.run(tool_box.simple_request(args.provider, args.request))
 
     print(response)
 
@@ -39,7 +44,8 @@ def simple_request(args: Namespace) -> None:
 
 
 def make_joke(args: Namespace) -> None:
-    response = tool_box.tell_joke(args.provider, args.tone, args.jokeType, args.audience)
+    response = asyncio.run(tool_box.tell_joke(args.provider, joke_type=args.jokeType, audience=args.audience,
+                                              tone=args.tone))
 
     print(response)
 
@@ -47,29 +53,27 @@ def make_joke(args: Namespace) -> None:
 
 
 def battle_sim(args: Namespace) -> None:
-    models: list[Model] = []
+    providers: list[str] = [args.provider, *(args.models or [])]
 
-    for provider in [args.provider, *args.models]:
-        key = f'{'default' if provider == '-' else provider}-{str(uuid.uuid4())[3::4]}'
-        model: Model = {
-            'provider': provider,
-            'key': key,
-            'response': ''
-        }
-        models.append(model)
+    if args.tournament:
+        tournament = Tournament(providers, pairing=args.pairing, concurrency=args.concurrency)
+        asyncio.run(tournament.start(args.numberOfBattles, args.firstMessage, args.output))
+        return
+
+    models: list[Model] = [create_model(provider) for provider in providers]
 
     battle = BattleSim(models)
-    battle.start(args.numberOfBattles, args.firstMessage)
+    asyncio.run(battle.start(args.numberOfBattles, args.firstMessage))
 
 
 def interactive(args: Namespace) -> None:
     models = view_user_conf()
 
-    def call_model(request: str, model: str):
+    async def call_model(request: str, model: str):
         response = provider_factory.get(model).make_request(system_message=args.tone, request=request, stream=True)
 
         result = ''
-        for chunk in response:
+        async for chunk in response:
             result += chunk
             yield result
 
@@ -84,7 +88,7 @@ def chat_bot(args: Namespace) -> None:
         response = provider.make_assistant_request(json=False, stream=True, use_tools=False)
         result = ''
 
-        for chunk in response:
+        async for chunk in response:
             if not chunk:
                 continue
             result += chunk.replace('<', '"').replace('>', '"').replace('/', '')
@@ -93,6 +97,30 @@ def chat_bot(args: Namespace) -> None:
     create_chat_display(chat)
 
 
+def bench_parser(args: Namespace) -> None:
+    results = benchmark_extractors(args.directory, args.engines, args.repeat)
+
+    print_results(results)
+
+
+def bench_index(args: Namespace) -> None:
+    kbase = provider_factory.get(args.provider).KBase
+
+    if not isinstance(kbase, VectorService) or isinstance(kbase, MMapVectorService):
+        print(f'benchIndex needs a vector (postgres) knowledge base, {args.provider} does not use one')
+        return
+
+    queries = None
+    if args.queries:
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    candidates = [parse_index_spec(spec) for spec in args.indexes]
+    results = asyncio.run(benchmark_indexes(kbase, candidates, sample=args.sample, k=args.k, queries=queries))
+
+    print_results(results)
+
+
 def add_config(args: Namespace) -> None:
     add_update_conf(args.file)
     return
@@ -1,7 +1,9 @@
-from typing import OrderedDict, TypedDict, Required, Iterator
+from typing import OrderedDict, TypedDict, Required, AsyncIterator
 
 from helpers import inject
 
+from llms.service.kbase import ContextCache
+from llms.service.ai import ResponseCache, create_response_cache, request_key, replay, record
 from llms.service import (
     AIService,
     KBaseService,
@@ -15,44 +17,93 @@ class ProviderConfig(TypedDict):
     aiConfig: Required[AIConfig]
     kbase: KBaseConfig
 
+@inject(provider_factory='provider_factory')
 class Provider(object):
-    def __init__(self, config: ProviderConfig, tone: str = '') -> None:
+    def __init__(self, config: ProviderConfig, tone: str = '', kbase: KBaseService | None = None) -> None:
         self.AIService: AIService = get_ai_service(config['aiConfig'], tone)
-        self.KBase: KBaseService = get_kbase_service(config['kbase'])
+        self.KBase: KBaseService = kbase if kbase is not None else get_kbase_service(config['kbase'])
+        # opt-in, only configs with a responseCache section are cached
+        self.response_cache: ResponseCache | None = create_response_cache(config['aiConfig']['responseCache']) \
+            if 'responseCache' in config['aiConfig'] else None
 
         if not self.KBase:
             self.use_k_base = False
         else:
             self.use_k_base = True
+            self.context_cache = ContextCache(self.KBase, config['kbase'].get('contextCache', {}))
 
     async def get_context(self, request: str = '') -> str:
         if self.use_k_base:
-            return await self.KBase.load_context(request)
+            return await self.context_cache.load_context(request)
 
         return ''
 
-    async def make_request(self, **kwargs) -> Iterator[str]:
+    async def make_request(self, **kwargs) -> AsyncIterator[str]:
         # Extract and remove the parameters we want to modify
         system_message = kwargs.pop('system_message', '')
         request = kwargs.pop('request', '')
 
-        # Modify system_message if needed
-        system_message += await self.get_context(request)
+        # Retrieved context is passed separately so the service can budget it
+        context = await self.get_context(request)
+
+        # Tool calls have side effects, never answer them from cache
+        key = None
+        if self.response_cache and not kwargs.get('use_tools'):
+            key = request_key(self.AIService.config, self.AIService.tone, system_message=system_message,
+                              context=context, request=request, json=kwargs.get('json', False),
+                              stream=kwargs.get('stream', False))
+            cached = await self.response_cache.get(key)
+
+            if cached is not None:
+                async for chunk in replay(cached):
+                    yield chunk
+                return
 
         # Pass everything to the underlying function
-        return self.AIService.make_request(
+        response = self.AIService.amake_request(
             system_message=system_message,
             request=request,
+            context=context,
             **kwargs
         )
 
-    async def update_messages(self, user_message: str, system_message: str = '', *args, **kwargs) -> None:
-        system_message += await self.get_context(user_message)
+        if key:
+            response = record(response, self.response_cache, key)
+
+        async for chunk in response:
+            yield chunk
+
+    async def update_messages(self, user_message: str = '', system_message: str = '', *args, **kwargs) -> None:
+        context = ''
+        if user_message:
+            context = await self.get_context(user_message)
+            # assistant requests offer tools unless told otherwise, budget for their schemas
+            prompt = self.AIService.pack_prompt(system_message, context, user_message,
+                                                used=self.AIService.history.used, use_tools=True)
+            system_message, context, user_message = prompt.system_message, prompt.context, prompt.request
         print(system_message)
-        self.AIService.update_messages(user_message=user_message, system_message=system_message, *args, **kwargs)
+        self.AIService.update_messages(user_message=user_message, system_message=system_message, context=context,
+                                       *args, **kwargs)
+        await self.compact_history()
+
+    async def compact_history(self) -> None:
+        """Summarize the turns evicted from the history window with the configured summaryProvider"""
+        history = self.AIService.history
 
-    def make_assistant_request(self, *args, **kwargs) -> Iterator[str]:
-        return self.AIService.make_assistant_request(*args, **kwargs)
+        if not history.evicted:
+            return
+
+        summarizer = None
+        if history.summary_provider:
+            # a dedicated instance, one-shot requests reset the message history of the service that makes them
+            name = history.summary_provider
+            summarizer = self.provider_factory.get(name, key=f'{name}-history-summary').AIService
+
+        await history.summarize(summarizer)
+
+    async def make_assistant_request(self, *args, **kwargs) -> AsyncIterator[str]:
+        async for chunk in self.AIService.amake_assistant_request(*args, **kwargs):
+            yield chunk
 
 
 
@@ -60,10 +111,16 @@ class Provider(object):
 class ProviderFactory(OrderedDict):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(args, **kwargs)
+        # one knowledge base per config: keyed providers (battles, tournaments) share it rather than each
+        # diffing, deleting and ingesting the same table concurrently
+        self.kbases: dict[str, KBaseService] = {}
 
     def __instantiate_provider(self, name: str, tone: str, key: str) -> None:
         config: ProviderConfig = self.config_loader.load(name)
-        provider: Provider = Provider(config, tone)
+        provider: Provider = Provider(config, tone, self.kbases.get(name))
+
+        if provider.KBase:
+            self.kbases[name] = provider.KBase
 
         if key:
             self.__setitem__(key, provider)
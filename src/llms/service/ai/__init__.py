@@ -3,6 +3,7 @@ from .anthropic_service import AnthropicService
 from .google_service import GoogleService
 
 from .ai_service import Library, AIService, AIConfig
+from .response_cache import ResponseCache, create_response_cache, request_key, replay, record
 
 
 def get_ai_service(config: AIConfig, tone: str = '') -> AIService:
@@ -1,7 +1,10 @@
 from abc import abstractmethod, ABC
 
 from enum import Enum
-from typing import TypedDict, NotRequired, Required, Iterator, Literal, Union
+from typing import TypedDict, NotRequired, Required, AsyncIterator, Literal, Union
+
+from .prompt_budget import PromptBudget, PackedPrompt
+from .history import ConversationHistory
 
 
 class Library(Enum):
@@ -10,16 +13,31 @@ class Library(Enum):
     OPENAI = 'OPENAI'
 
 
+class ResponseCacheConfig(TypedDict):
+    backend: Literal['memory', 'redis', 'none']
+    ttl: NotRequired[int]
+    maxEntries: NotRequired[int]
+    redisUrl: NotRequired[str]
+
+
+class HistoryConfig(TypedDict):
+    maxTokens: NotRequired[int]
+    summaryTokens: NotRequired[int]
+    summaryProvider: NotRequired[str]
+
+
 class BaseConfig(TypedDict):
     name: Required[str]
     tone: Required[str]
     request: Required[str]
     model: Required[str]
+    responseCache: NotRequired[ResponseCacheConfig]
+    history: NotRequired[HistoryConfig]
 
 
 class AnthropicConfig(BaseConfig):
     library: Literal[Library.ANTHROPIC]
-    requestCharLimit: NotRequired[int]
+    contextWindow: NotRequired[int]
     maxTokens: Required[int]
     temperature: Required[int]
     baseUrl: NotRequired[str]
@@ -28,7 +46,8 @@ class AnthropicConfig(BaseConfig):
 
 class OpenAIConfig(BaseConfig):
     library: Literal[Library.OPENAI]
-    requestCharLimit: NotRequired[int]
+    contextWindow: NotRequired[int]
+    maxToolRounds: NotRequired[int]
     maxTokens: NotRequired[int]
     temperature: NotRequired[int]
     baseUrl: NotRequired[str]
@@ -37,7 +56,7 @@ class OpenAIConfig(BaseConfig):
 
 class GoogleConfig(BaseConfig):
     library: Literal[Library.GOOGLE]
-    requestCharLimit: NotRequired[int]
+    contextWindow: NotRequired[int]
     maxTokens: NotRequired[int]
     temperature: NotRequired[int]
     baseUrl: NotRequired[str]
@@ -52,21 +71,54 @@ class AIService(ABC):
     def __init__(self, config: AIConfig) -> None:
         self.config: AIConfig = config
         self.tone = config['tone']
-        self.request_char_limit = config['requestCharLimit'] or 0
+        # the tone as it fit in the last packed prompt, this is what the services send
+        self.packed_tone = self.tone
+        self.budget = PromptBudget(config['model'], config.get('maxTokens'), config.get('contextWindow'))
+        self.last_prompt_tokens: dict[str, int] = {}
+        self.last_cache_usage: dict[str, int] = {}
+        self.history = ConversationHistory(self.budget, config.get('history', {}))
 
     @abstractmethod
-    def make_request(self, system_message: str = '', request: str = '', json: bool = False, stream: bool = False, use_tools: bool = False) -> Iterator[
-        str]:
+    def amake_request(self, system_message: str = '', request: str = '', json: bool = False, stream: bool = False,
+                      use_tools: bool = False, context: str = '') -> AsyncIterator[str]:
         raise NotImplementedError
 
+    def fixed_tokens(self, use_tools: bool = False) -> int:
+        """Tokens sent with every request besides the packed parts and the history"""
+        return 0
+
+    def pack_prompt(self, system_message: str = '', context: str = '', request: str = '', used: int = 0,
+                    use_tools: bool = False) -> PackedPrompt:
+        """Fit tone, system message, context and request in the model's token budget and report the counts"""
+        prompt = self.budget.pack(self.tone, system_message, context, request, used, self.fixed_tokens(use_tools))
+        self.packed_tone = prompt.tone
+        self.last_prompt_tokens = prompt.counts
+        print(prompt.report())
+
+        return prompt
+
+    def report_cache_usage(self, input_tokens: int, cached_tokens: int, cache_write_tokens: int = 0) -> None:
+        """Record how much of the prompt the provider served from its prompt cache"""
+        self.last_cache_usage = {'input': input_tokens, 'cached': cached_tokens, 'written': cache_write_tokens}
+        share = f' ({cached_tokens / input_tokens:.0%})' if input_tokens else ''
+        written = f', {cache_write_tokens} written to cache' if cache_write_tokens else ''
+        print(f'Prompt cache: {cached_tokens} of {input_tokens} input tokens cached{share}{written}')
+
     @abstractmethod
     def update_messages(self, use_system_message: bool = '', system_message: str = '', assistant_message: str ='',
-                        user_message: str ='', full_history: list[dict] = None, assistant_thread: bool = False) -> None:
+                        user_message: str ='', full_history: list[dict] = None, assistant_thread: bool = False,
+                        context: str = '') -> None:
         raise NotImplementedError
 
     @abstractmethod
-    def make_assistant_request(self, json: bool = False, stream: bool = False, use_tools: bool = False) -> Iterator[str]:
+    def amake_assistant_request(self, json: bool = False, stream: bool = False, use_tools: bool = False) \
+            -> AsyncIterator[str]:
         raise NotImplementedError
 
+    def astream(self, system_message: str = '', request: str = '', json: bool = False, use_tools: bool = False,
+                context: str = '') -> AsyncIterator[str]:
+        return self.amake_request(system_message=system_message, request=request, json=json, stream=True,
+                                  use_tools=use_tools, context=context)
+
     def get_name(self) -> str:
         return f'{self.config['library']}-{self.config['model']}'
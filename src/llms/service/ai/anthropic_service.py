@@ -1,107 +1,158 @@
 import sys
-from typing import Iterator
+from typing import AsyncIterator
 
 import anthropic
 
 from .ai_service import AIService, AnthropicConfig
 
+# marks the end of a prompt prefix Anthropic should cache, prefixes under the model's minimum length are not cached
+CACHE_CONTROL = {"type": "ephemeral"}
+
 
 class AnthropicService(AIService):
     def __init__(self, config: AnthropicConfig):
         super().__init__(config)
-        self.MESSAGES: list[dict] = []
+        self.system_message = ''
+        self.context = ''
         if config['key']:
-            self.ANTHROPIC = anthropic.Anthropic(api_key=config['key'])
+            self.ANTHROPIC = anthropic.AsyncAnthropic(api_key=config['key'])
         else:
-            self.ANTHROPIC = anthropic.Anthropic()
+            self.ANTHROPIC = anthropic.AsyncAnthropic()
 
         return
 
-    def update_messages(self, use_system_message: bool = True, system_message: str = '', assistant_message: str = '',
-                        user_message: str = '', full_history: list[dict] | None = None, assistant_thread: bool = False,) -> None:
+    @property
+    def MESSAGES(self) -> list[dict]:
+        volatile = '\n\n'.join(part for part in (self.history.summary_message, self.context) if part)
+
+        return self.build_messages(list(self.history.messages), volatile)
+
+    @staticmethod
+    def __text_blocks(content: str | list[dict]) -> list[dict]:
+        return content if isinstance(content, list) else [{"type": "text", "text": content}]
+
+    def build_messages(self, messages: list[dict], volatile: str = '') -> list[dict]:
+        """
+        Anthropic caches tools, then system, then messages as one prefix. Per-request parts (summary, retrieved
+        context) therefore go in a block at the start of the latest user turn, and the cache breakpoint on the
+        message before it: that message is unchanged on the next turn, which then reads the conversation cached by
+        this one.
+        """
+        latest = next((i for i in range(len(messages) - 1, -1, -1) if messages[i]['role'] == 'user'), None)
+        cached = len(messages) - 1 if latest is None else latest - 1
+
+        if latest is not None and volatile:
+            messages[latest] = messages[latest] | {
+                "content": [{"type": "text", "text": volatile}, *self.__text_blocks(messages[latest]['content'])]
+            }
+
+        if cached >= 0 and messages[cached]['content']:
+            blocks = self.__text_blocks(messages[cached]['content'])
+            messages[cached] = messages[cached] | {
+                "content": [*blocks[:-1], blocks[-1] | {"cache_control": CACHE_CONTROL}]
+            }
+
+        return messages
+
+    def system_blocks(self, system_message: str = '') -> list[dict]:
+        """Tone and system message, the stable part of every request, each ending in a cache breakpoint"""
+        blocks = [{"type": "text", "text": self.packed_tone, "cache_control": CACHE_CONTROL}]
+
+        if system_message:
+            blocks.append({"type": "text", "text": system_message, "cache_control": CACHE_CONTROL})
+
+        return blocks
 
-        for history in (full_history or []):
-            if 'metadata' in history:
-                del history['metadata']
-            if 'options' in history:
-                del history['options']
+    def __report_usage(self, usage) -> None:
+        cached = getattr(usage, 'cache_read_input_tokens', None) or 0
+        written = getattr(usage, 'cache_creation_input_tokens', None) or 0
+        self.report_cache_usage(usage.input_tokens + cached + written, cached, written)
 
-        if full_history:
-            self.MESSAGES = full_history
+    def update_messages(self, use_system_message: bool = True, system_message: str = '', assistant_message: str = '',
+                        user_message: str = '', full_history: list[dict] | None = None, assistant_thread: bool = False,
+                        context: str = '') -> None:
+        if use_system_message:
+            self.system_message = system_message or ''
+
+        if full_history is not None:
+            self.history.sync(full_history)
         if assistant_message:
-            self.MESSAGES.append({
+            self.history.append({
                     "role": "assistant",
                     "content": assistant_message
                 })
         if user_message:
-            self.MESSAGES.append({
+            self.context = context
+            self.history.append({
                 "role": "user",
                 "content": user_message
             })
 
-    def make_assistant_request(self, json: bool = False, stream: bool = False, use_tools: bool = False) -> Iterator[str]:
+    async def amake_assistant_request(self, json: bool = False, stream: bool = False, use_tools: bool = False) \
+            -> AsyncIterator[str]:
         method_args: dict = {
             'model': self.config['model'],
             'max_tokens': self.config['maxTokens'],
             'temperature': self.config['temperature'],
-            'system': self.tone,
+            'system': self.system_blocks(self.system_message),
             'messages': self.MESSAGES
         }
 
-        if stream:
-            yield from self.__stream_request(method_args)
-        else:
-            yield from self.__simple_request(method_args)
+        response = self.__stream_request(method_args) if stream else self.__simple_request(method_args)
 
-    def message_builder(self, request: str) -> list[dict]:
-        user_content = (request or self.config['request']) \
-            if self.request_char_limit <= 0 \
-            else (request or self.config['request'])[:self.request_char_limit]
+        async for chunk in response:
+            yield chunk
 
+    def message_builder(self, request: str) -> list[dict]:
         messages = [
             {
                 "role": "user",
-                "content": user_content
+                "content": request or self.config['request']
             }
         ]
 
         return messages
 
-    def __simple_request(self, method_args) -> Iterator[str]:
-        response = self.ANTHROPIC.messages.create(**method_args)
+    async def __simple_request(self, method_args) -> AsyncIterator[str]:
+        response = await self.ANTHROPIC.messages.create(**method_args)
 
         if not response.content:
             print("\nAnthropic Library request failed\n")
             sys.exit(1)
 
+        self.__report_usage(response.usage)
+
         for content in response.content:
             yield content.text
 
-    def __stream_request(self, method_args) -> Iterator[str]:
+    async def __stream_request(self, method_args) -> AsyncIterator[str]:
         response = self.ANTHROPIC.messages.stream(**method_args)
 
         if not response:
             print("\nAnthropic Library request failed\n")
             sys.exit(1)
 
-        with response as stream:
-            for text in stream.text_stream:
+        async with response as stream:
+            async for text in stream.text_stream:
                 yield text.replace("\n", " ").replace("\r", " ")
 
-    def make_request(self, system_message: str = '', request: str = '', json: bool = False, stream: bool = False, use_tools: bool = False) \
-            -> Iterator[str]:
+            self.__report_usage((await stream.get_final_message()).usage)
+
+    async def amake_request(self, system_message: str = '', request: str = '', json: bool = False, stream: bool = False,
+                            use_tools: bool = False, context: str = '') -> AsyncIterator[str]:
 
-        messages = self.message_builder(request)
+        prompt = self.pack_prompt(system_message, context, request or self.config['request'])
+        messages = self.build_messages(self.message_builder(prompt.request), prompt.context)
 
         method_args: dict = {
             'model': self.config['model'],
             'max_tokens': self.config['maxTokens'],
             'temperature': self.config['temperature'],
-            'system': f"{self.tone}. {system_message}" if system_message else self.tone,
+            'system': self.system_blocks(prompt.system_message),
             'messages': messages,
         }
 
-        if stream:
-            yield from self.__stream_request(method_args)
-        else:
-            yield from self.__simple_request(method_args)
+        response = self.__stream_request(method_args) if stream else self.__simple_request(method_args)
+
+        async for chunk in response:
+            yield chunk
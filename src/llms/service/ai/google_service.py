@@ -1,4 +1,4 @@
-from typing import Iterator
+from typing import AsyncIterator
 
 import google.generativeai
 
@@ -8,7 +8,8 @@ from .ai_service import AIService, GoogleConfig
 class GoogleService(AIService):
     def __init__(self, config: GoogleConfig) -> None:
         super().__init__(config)
-        self.MESSAGES = []
+        self.system_message: str = ''
+        self.context: str = ''
 
         if config['key']:
             google.generativeai.configure(api_key=config['key'])
@@ -17,29 +18,85 @@ class GoogleService(AIService):
 
         return
 
-    def update_messages(self, use_system_message: bool = True, system_message: str = '', assistant_message: str = '',
-                        user_message: str = '', full_history: list[dict] | None = None, assistant_thread: bool = False) -> None:
-        """
-        TODO
-        """
+    @property
+    def MESSAGES(self) -> list[dict]:
+        return list(self.history.messages)
+
+    @staticmethod
+    def __to_content(message: dict) -> dict:
+        return {
+            "role": "model" if message['role'] == 'assistant' else "user",
+            "parts": [message['content']]
+        }
 
-    def make_assistant_request(self, json: bool = False, stream: bool = False, use_tools: bool = False) -> Iterator[str]:
-        pass
+    def update_messages(self, use_system_message: bool = True, system_message: str = '', assistant_message: str = '',
+                        user_message: str = '', full_history: list[dict] | None = None, assistant_thread: bool = False,
+                        context: str = '') -> None:
+        if assistant_thread:
+            return
 
-    def make_request(self, system_message: str = '', request: str = '', json: bool = False, stream: bool = False, use_tools: bool = False) \
-            -> Iterator[str]:
+        if use_system_message:
+            self.system_message = system_message or ''
 
-        user_message = (request or self.config['request']) \
-            if self.request_char_limit <= 0 \
-            else (request or self.config['request'])[:self.request_char_limit]
+        if full_history is not None:
+            self.history.sync(full_history, self.__to_content)
+        if assistant_message:
+            self.history.append({
+                "role": "model",
+                "parts": [assistant_message]
+            })
+        if user_message:
+            self.context = context
+            self.history.append({
+                "role": "user",
+                "parts": [user_message]
+            })
 
+    def __get_model(self, system_message: str = '', context: str = '', summary: str = '') \
+            -> google.generativeai.GenerativeModel:
+        # stable instructions first so implicit prefix caching can reuse them, per request parts last
+        instruction = f"{self.packed_tone}. {system_message}" if system_message else self.packed_tone
         method_args: dict = {
             'model_name': self.config['model'],
-            'system_instruction': f"{self.tone}. {system_message}" if system_message else self.tone
+            'system_instruction': '\n\n'.join(part for part in (instruction, summary, context) if part)
         }
 
-        llm = google.generativeai.GenerativeModel(**method_args)
+        return google.generativeai.GenerativeModel(**method_args)
+
+    def __report_usage(self, response) -> None:
+        usage = getattr(response, 'usage_metadata', None)
+
+        if usage and usage.prompt_token_count:
+            self.report_cache_usage(usage.prompt_token_count, getattr(usage, 'cached_content_token_count', 0) or 0)
+
+    async def __generate(self, llm: google.generativeai.GenerativeModel, contents: str | list[dict], stream: bool) \
+            -> AsyncIterator[str]:
+        if stream:
+            response = await llm.generate_content_async(contents, stream=True)
+
+            async for chunk in response:
+                yield chunk.text
+
+            # usage is complete once the stream has been consumed
+            self.__report_usage(response)
+        else:
+            response = await llm.generate_content_async(contents)
+            self.__report_usage(response)
+
+            yield response.text
+
+    async def amake_assistant_request(self, json: bool = False, stream: bool = False, use_tools: bool = False) \
+            -> AsyncIterator[str]:
+        llm = self.__get_model(self.system_message, self.context, self.history.summary_message)
+
+        async for chunk in self.__generate(llm, self.MESSAGES, stream):
+            yield chunk
+
+    async def amake_request(self, system_message: str = '', request: str = '', json: bool = False, stream: bool = False,
+                            use_tools: bool = False, context: str = '') -> AsyncIterator[str]:
 
-        response = llm.generate_content(user_message)
+        prompt = self.pack_prompt(system_message, context, request or self.config['request'])
+        llm = self.__get_model(prompt.system_message, prompt.context)
 
-        yield response.text
+        async for chunk in self.__generate(llm, prompt.request, stream):
+            yield chunk
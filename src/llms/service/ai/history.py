@@ -0,0 +1,193 @@
+import json
+from collections import deque
+from typing import Any, Callable, TYPE_CHECKING
+
+from helpers.chunker import trim_to_tokens
+
+from .prompt_budget import PromptBudget
+
+if TYPE_CHECKING:
+    from .ai_service import AIService, HistoryConfig
+
+DEFAULT_SUMMARY_TOKENS = 512
+# tokens per message for the role and separators
+MESSAGE_TOKENS = 4
+# compaction evicts down to this share of maxTokens so summaries are written every few turns, not every turn
+LOW_WATER = 0.75
+# a tool result is never trimmed below this many tokens, even when the current round alone fills the window
+MIN_TOOL_TOKENS = 64
+# keys Gradio adds to its chat history that the model APIs do not accept
+GRADIO_KEYS = ('metadata', 'options')
+
+SUMMARY_INSTRUCTIONS = ('You maintain a running summary of a conversation. Merge the previous summary with the new '
+                        'turns into a single summary of at most {tokens} tokens. Keep names, facts, decisions, '
+                        'preferences and open questions; drop greetings and repetition. Reply with the summary only.')
+
+
+def message_role(message: Any) -> str:
+    return message.get('role', '') if isinstance(message, dict) else getattr(message, 'role', '')
+
+
+def message_text(message: Any) -> str:
+    """Text of a message in any of the services' formats (OpenAI, Anthropic, Google, SDK message objects)"""
+    if not isinstance(message, dict):
+        message = message.model_dump(exclude_none=True) if hasattr(message, 'model_dump') else vars(message)
+
+    parts = message.get('parts') or [message.get('content') or '']
+    text = ''.join(part if isinstance(part, str) else json.dumps(part, default=str) for part in parts)
+
+    if message.get('tool_calls'):
+        text += json.dumps(message['tool_calls'], default=str)
+
+    return text
+
+
+def fingerprint(entry: dict) -> tuple[str, str]:
+    return entry.get('role', ''), str(entry.get('content'))
+
+
+class ConversationHistory:
+    """
+    Sliding window over a conversation, kept within `maxTokens`, plus a rolling summary of the turns that fell out
+    of it.
+
+    Every message is counted once when it is added and the window total is kept as a running sum. Once the total
+    passes `maxTokens` the oldest turns are evicted and queued as transcript lines for `summarize`, which folds them
+    into the summary with a separate, cheaper service. A message is evicted together with the tool results that
+    follow it, so a tool call never loses its results nor a result its call, and the current round (from the latest
+    user turn on) is never evicted: a tool result too large for what the round leaves of the window is trimmed.
+    """
+
+    def __init__(self, budget: PromptBudget, config: 'HistoryConfig') -> None:
+        self.budget = budget
+        self.max_tokens = config.get('maxTokens', budget.budget // 2)
+        self.summary_tokens = config.get('summaryTokens', DEFAULT_SUMMARY_TOKENS)
+        self.summary_provider = config.get('summaryProvider', '')
+        self.messages: deque = deque()
+        self.counts: deque[int] = deque()
+        self.tokens = 0
+        self.summary = ''
+        self.summary_count = 0
+        self.evicted: list[str] = []
+        # how much of an external (Gradio) history has been absorbed, and messages appended locally since then
+        self.synced = 0
+        self.last_synced: tuple[str, str] | None = None
+        self.unsynced = 0
+
+    @property
+    def summary_message(self) -> str:
+        return f'Summary of the earlier conversation:\n{self.summary}' if self.summary else ''
+
+    @property
+    def used(self) -> int:
+        """Tokens the window and summary take from the prompt budget"""
+        return self.tokens + self.summary_count
+
+    def clear(self) -> None:
+        self.messages.clear()
+        self.counts.clear()
+        self.tokens = 0
+        self.summary, self.summary_count = '', 0
+        self.evicted.clear()
+        self.synced, self.last_synced, self.unsynced = 0, None, 0
+
+    def __current_round(self) -> int:
+        """Index of the latest user turn, or without one, of the latest message that is not a tool result"""
+        for i in range(len(self.messages) - 1, -1, -1):
+            if message_role(self.messages[i]) == 'user':
+                return i
+
+        i = len(self.messages) - 1
+        while i > 0 and message_role(self.messages[i]) == 'tool':
+            i -= 1
+
+        return max(i, 0)
+
+    def __fit_tool_result(self, message: dict, count: int) -> tuple[dict, int]:
+        current = sum(list(self.counts)[self.__current_round():]) if self.messages else 0
+        available = max(self.max_tokens - current - MESSAGE_TOKENS, MIN_TOOL_TOKENS)
+
+        if count - MESSAGE_TOKENS <= available:
+            return message, count
+
+        content, tokens = trim_to_tokens(message['content'], available, self.budget.encoding)
+        print(f'*** trimmed {message.get("name", "tool")} result from {count - MESSAGE_TOKENS} to {tokens} tokens ***')
+
+        return message | {'content': content}, tokens + MESSAGE_TOKENS
+
+    def append(self, message: Any) -> None:
+        count = self.budget.count(message_text(message)) + MESSAGE_TOKENS
+
+        if isinstance(message, dict) and message.get('role') == 'tool' and isinstance(message.get('content'), str):
+            message, count = self.__fit_tool_result(message, count)
+
+        self.messages.append(message)
+        self.counts.append(count)
+        self.tokens += count
+        self.unsynced += 1
+
+        if self.tokens > self.max_tokens:
+            self.__evict()
+
+    def __evict(self) -> None:
+        target = int(self.max_tokens * LOW_WATER)
+        # messages before the current round, which always stays
+        evictable = self.__current_round()
+
+        while evictable and self.tokens > target:
+            # a message and the tool results answering it leave together
+            unit = 1
+            while unit < evictable and message_role(self.messages[unit]) == 'tool':
+                unit += 1
+
+            for _ in range(unit):
+                message = self.messages.popleft()
+                self.tokens -= self.counts.popleft()
+                self.evicted.append(f'{message_role(message)}: {message_text(message)}')
+
+            evictable -= unit
+
+        self.unsynced = min(self.unsynced, len(self.messages))
+
+    def sync(self, history: list[dict], convert: Callable[[dict], Any] = lambda entry: entry) -> None:
+        """
+        Absorb a history kept by the caller, which Gradio re-sends in full every turn. Only entries past the ones
+        already seen are counted and appended; messages appended locally since the last sync are replaced by the
+        history's own copy of them. A history that does not extend the one seen before is a new conversation.
+        """
+        for _ in range(self.unsynced):
+            self.messages.pop()
+            self.tokens -= self.counts.pop()
+
+        if len(history) < self.synced or (self.synced and fingerprint(history[self.synced - 1]) != self.last_synced):
+            self.clear()
+
+        for entry in history[self.synced:]:
+            self.append(convert({key: value for key, value in entry.items() if key not in GRADIO_KEYS}))
+
+        self.synced = len(history)
+        self.last_synced = fingerprint(history[-1]) if history else None
+        self.unsynced = 0
+
+    async def summarize(self, service: 'AIService | None') -> None:
+        """Fold the evicted turns into the summary, without a summary service they are dropped"""
+        if not self.evicted:
+            return
+
+        transcript, self.evicted = '\n'.join(self.evicted), []
+
+        if service is None:
+            return
+
+        request = f'Previous summary:\n{self.summary or "(none)"}\n\nNew turns:\n{transcript}'
+        summary = ''
+
+        try:
+            async for chunk in service.amake_request(
+                    system_message=SUMMARY_INSTRUCTIONS.format(tokens=self.summary_tokens), request=request):
+                summary += chunk
+        except Exception as e:
+            print(f'*** unable to summarize conversation history, dropping {len(transcript)} characters: {e} ***')
+            return
+
+        self.summary, self.summary_count = trim_to_tokens(summary.strip(), self.summary_tokens, self.budget.encoding)
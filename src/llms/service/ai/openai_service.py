@@ -1,34 +1,79 @@
+import asyncio
 import sys
-from typing import Iterator
+from json import dumps
+from typing import AsyncIterator
 
-from openai import OpenAI, Stream, BadRequestError
+from openai import AsyncOpenAI, AsyncStream, BadRequestError
 from openai.types.chat import ChatCompletionMessageToolCall, ChatCompletionChunk, ChatCompletion, ChatCompletionMessage
 
 from helpers import inject
+from helpers.chunker import trim_to_tokens
 
 from .ai_service import AIService, OpenAIConfig
+from .history import message_role, MESSAGE_TOKENS
+
+# model turns that may request tools before the model has to answer without them
+DEFAULT_MAX_TOOL_ROUNDS = 4
+# largest share of the prompt budget a single tool result may take
+TOOL_RESULT_SHARE = 0.25
 
 
 @inject(tool_box='tool_box')
 class OpenAIService(AIService):
     def __init__(self, config: OpenAIConfig):
         super().__init__(config)
-        self.MESSAGES: list[dict | ChatCompletionMessage] = []
-        self.OPENAI: OpenAI
+        self.system_messages: list[dict] = []
+        self.context = ''
+        self.OPENAI: AsyncOpenAI
         self.ignore_tools = False
+        self.ignore_stream_options = False
+        self.tool_tokens: int | None = None
 
         if config['baseUrl'] and config['key']:
-            self.OPENAI = OpenAI(base_url=config['baseUrl'], api_key=config['key'])
+            self.OPENAI = AsyncOpenAI(base_url=config['baseUrl'], api_key=config['key'])
         elif config['baseUrl']:
-            self.OPENAI = OpenAI(base_url=config['baseUrl'])
+            self.OPENAI = AsyncOpenAI(base_url=config['baseUrl'])
         elif config['key']:
-            self.OPENAI = OpenAI(api_key=config['key'])
+            self.OPENAI = AsyncOpenAI(api_key=config['key'])
         else:
-            self.OPENAI = OpenAI()
+            self.OPENAI = AsyncOpenAI()
 
         self.instantiate_messages(use_system_message=True)
 
-    def __handle_tool_call(self, tool_call: ChatCompletionMessageToolCall) \
+    @property
+    def MESSAGES(self) -> list[dict | ChatCompletionMessage]:
+        """
+        Stable prefix first (tone and system message, summary, earlier turns) so the provider can reuse its cached
+        prefix between requests; the retrieved context changes every turn and goes right before the latest user turn.
+        """
+        summary = [{"role": "system", "content": self.history.summary_message}] if self.history.summary else []
+        history = list(self.history.messages)
+        latest = next((i for i in range(len(history) - 1, -1, -1) if message_role(history[i]) == 'user'),
+                      len(history))
+        context = [{"role": "system", "content": self.context}] if self.context else []
+
+        return [*self.system_messages, *summary, *history[:latest], *context, *history[latest:]]
+
+    def fixed_tokens(self, use_tools: bool = False) -> int:
+        """The configured request pinned after the system message, and the tool schemas when tools are offered"""
+        request = self.config['request']
+        tokens = self.budget.count(request) + MESSAGE_TOKENS if request else 0
+
+        if use_tools and not self.ignore_tools:
+            if self.tool_tokens is None:
+                self.tool_tokens = self.budget.count(dumps(self.tool_box.get_tools()))
+            tokens += self.tool_tokens
+
+        return tokens
+
+    def __report_usage(self, usage) -> None:
+        if not usage:
+            return
+
+        details = getattr(usage, 'prompt_tokens_details', None)
+        self.report_cache_usage(usage.prompt_tokens, getattr(details, 'cached_tokens', None) or 0)
+
+    async def __handle_tool_call(self, tool_call: ChatCompletionMessageToolCall) \
             -> dict[str, str | dict[str, str]]:
         if isinstance(tool_call, dict):
             tool_call_id = tool_call['id']
@@ -42,7 +87,25 @@ class OpenAIService(AIService):
         tool_result = ''
 
         if arguments:
-            tool_result = self.tool_box.handle_tool_call(name, arguments)
+            timeout = self.tool_box.get_timeout(name)
+            try:
+                result = await asyncio.wait_for(self.tool_box.handle_tool_call(name, arguments), timeout)
+                tool_result = result['content']
+                if result['cached']:
+                    print(f'*** tool {name} reused a cached result ***')
+            except asyncio.TimeoutError:
+                print(f'*** tool {name} timed out after {timeout}s ***')
+                tool_result = f'error: {name} did not finish within {timeout} seconds'
+            except Exception as e:
+                print(f'*** tool {name} failed: {e} ***')
+                tool_result = f'error: {name} failed: {e}'
+
+        # a whole scraped page would otherwise take the prompt window on its own
+        limit = int(self.budget.budget * TOOL_RESULT_SHARE)
+        trimmed, tokens = trim_to_tokens(tool_result, limit, self.budget.encoding)
+        if trimmed != tool_result:
+            print(f'*** trimmed {name} result to {tokens} tokens ***')
+            tool_result = trimmed
 
         return {
             "tool_call_id": tool_call_id,
@@ -51,15 +114,30 @@ class OpenAIService(AIService):
             "content": tool_result
         }
 
-    def __handle_stream_response(self, response: Stream[ChatCompletionChunk]) \
-            -> Iterator[str]:
+    async def __run_tools(self, calls: list) -> None:
+        """Run every tool call of a model turn concurrently, results are appended in call order"""
+        results = await asyncio.gather(*(self.__handle_tool_call(call) for call in calls))
+
+        for result in results:
+            self.update_messages(single_message=result)
+
+    def __follow_up(self, stream: bool, depth: int) -> AsyncIterator[str]:
+        """One request per tool round, the last allowed round is made without tools so the model has to answer"""
+        rounds = self.config.get('maxToolRounds', DEFAULT_MAX_TOOL_ROUNDS)
+
+        return self.call_openai_api(False, stream, depth < rounds, depth)
+
+    async def __handle_stream_response(self, response: AsyncStream[ChatCompletionChunk], depth: int) \
+            -> AsyncIterator[str]:
         if not response:
             print("\nOpenAI Library request failed\n")
             sys.exit(1)
 
         calls = []
 
-        for chunk in response:
+        async for chunk in response:
+            if chunk and getattr(chunk, 'usage', None):
+                self.__report_usage(chunk.usage)
             if not chunk or not chunk.choices:
                 continue
             for choice in chunk.choices:
@@ -84,40 +162,68 @@ class OpenAIService(AIService):
                             call["function"]["name"] += tool_call.function.name
                         if tool_call.function.arguments:
                             call["function"]["arguments"] += tool_call.function.arguments
-                else:
+                elif choice.delta.content:
                     yield choice.delta.content
 
         if calls:
             self.update_messages(tool_calls=calls)
+            await self.__run_tools(calls)
 
-            for call in calls:
-                tool_result = self.__handle_tool_call(call)
-                self.update_messages(single_message=tool_result)
-
-            yield from self.make_assistant_request(False, True, False)
+            async for chunk in self.__follow_up(True, depth + 1):
+                yield chunk
 
-    def __handle_response(self, response: ChatCompletion) \
-            -> Iterator[str]:
+    async def __handle_response(self, response: ChatCompletion, depth: int) \
+            -> AsyncIterator[str]:
         if not response.choices:
             print("\nOpenAI Library request failed\n")
             sys.exit(1)
 
-        for choice in response.choices:
-            message = choice.message
+        self.__report_usage(response.usage)
+
+        # requests are made with a single choice (n=1)
+        choice = response.choices[0]
+        message = choice.message
 
-            if message.tool_calls and choice.finish_reason == "tool_calls":
-                for tool_call in message.tool_calls:
-                    tool_result = self.__handle_tool_call(tool_call)
+        if message.tool_calls and choice.finish_reason == "tool_calls":
+            self.update_messages(single_message=message)
+            await self.__run_tools(message.tool_calls)
 
-                    self.update_messages(single_message=message)
-                    self.update_messages(single_message=tool_result)
+            async for chunk in self.__follow_up(False, depth + 1):
+                yield chunk
+        else:
+            yield message.content or ''
+
+    async def __retry_without_options(self, method_args: dict, error: BadRequestError):
+        """
+        Retry a rejected request without stream_options, then without the tools as well, and only stop sending the
+        option whose removal is what made the request succeed. A rejected conversation would fail again as it is.
+        """
+        retries = []
+        if 'stream_options' in method_args:
+            retries.append({'stream_options'})
+        if 'tools' in method_args:
+            retries.append({'stream_options', 'tools', 'tool_choice'})
+
+        for dropped in retries:
+            print(f'exception: {error}')
+            try:
+                response = await self.OPENAI.chat.completions.create(
+                    **{key: value for key, value in method_args.items() if key not in dropped})
+            except BadRequestError as e:
+                error = e
+                continue
 
-                yield from self.make_assistant_request(False, False, False)
+            if 'tools' in dropped:
+                self.ignore_tools = True
             else:
-                yield choice.message.content or ''
+                self.ignore_stream_options = True
+
+            return response
+
+        raise error
 
-    def call_openai_api(self, json: bool, stream: bool, use_tools: bool) \
-            -> Iterator[str]:
+    async def call_openai_api(self, json: bool, stream: bool, use_tools: bool, depth: int = 0) \
+            -> AsyncIterator[str]:
 
         method_args: dict = {
             'model': self.config['model'],
@@ -128,6 +234,9 @@ class OpenAIService(AIService):
             method_args.__setitem__('response_format', {"type": "json_object"})
         if stream:
             method_args.__setitem__('stream', True)
+            # the last chunk then carries usage, including cached prompt tokens
+            if not self.ignore_stream_options:
+                method_args.__setitem__('stream_options', {"include_usage": True})
         if use_tools and not self.ignore_tools:
             method_args.__setitem__('tools', self.tool_box.get_tools())
             method_args.__setitem__('tool_choice', 'auto')
@@ -135,71 +244,74 @@ class OpenAIService(AIService):
             method_args.__setitem__('temperature', self.config['temperature'])
 
         try:
-            response = self.OPENAI.chat.completions.create(**method_args)
+            response = await self.OPENAI.chat.completions.create(**method_args)
         except BadRequestError as e:
-            self.ignore_tools = True
-            print(f'exception: {e}')
-            if 'tools' in method_args:
-                method_args.__delitem__('tools')
-            if 'tool_choice' in method_args:
-                method_args.__delitem__('tool_choice')
-            response = self.OPENAI.chat.completions.create(**method_args)
+            response = await self.__retry_without_options(method_args, e)
 
-        if stream:
-            return self.__handle_stream_response(response)
-        else:
-            return self.__handle_response(response)
+        handler = self.__handle_stream_response(response, depth) if stream else self.__handle_response(response, depth)
+
+        async for chunk in handler:
+            yield chunk
+
+    def __system_messages(self, system_message: str = None) -> list[dict]:
+        messages = [{
+            "role": "system",
+            "content": f"{self.packed_tone}. {system_message}" if system_message else self.packed_tone
+        }]
+        if self.config['request']:
+            messages.append({
+                "role": "user",
+                "content": f'{self.config['request']}'
+            })
+
+        return messages
 
     def instantiate_messages(self, system_message: str = None, use_system_message: bool = False):
-        if use_system_message:
-            self.MESSAGES = [{
-                "role": "system",
-                "content": f"{self.tone}. {system_message}" if system_message else self.tone
-            }]
-            if self.config['request']:
-                self.MESSAGES.append({
-                    "role": "user",
-                    "content": f'{self.config['request']}'
-                })
-        else:
-            self.MESSAGES = []
+        self.history.clear()
+        self.context = ''
+        self.system_messages = self.__system_messages(system_message) if use_system_message else []
 
     def update_messages(self, use_system_message: bool = False, system_message: str = None,
                         assistant_message: str = None, user_message: str = None, full_history: list[dict] = None,
-                        assistant_thread: bool = False, single_message: dict | ChatCompletionMessage = None, tool_calls: list[dict] = None):
+                        assistant_thread: bool = False, single_message: dict | ChatCompletionMessage = None, tool_calls: list[dict] = None,
+                        context: str = ''):
         if assistant_thread:
             return
 
         if full_history:
-            self.instantiate_messages(system_message, use_system_message)
-            self.MESSAGES += full_history
+            self.system_messages = self.__system_messages(system_message) if use_system_message else []
+            self.history.sync(full_history)
         elif use_system_message:
             self.instantiate_messages(system_message, use_system_message)
 
         if assistant_message:
-            self.MESSAGES.append({
+            self.history.append({
                     "role": "assistant",
                     "content": assistant_message
                 })
         if user_message:
-            self.MESSAGES.append({
+            self.context = context
+            self.history.append({
                 "role": "user",
                 "content": user_message
             })
         if tool_calls:
-            self.MESSAGES.append({
+            self.history.append({
                 "role": "assistant",
                 "content": None,
                 "tool_calls": tool_calls
             })
 
         if single_message:
-            self.MESSAGES.append(single_message)
+            self.history.append(single_message)
 
-    def make_assistant_request(self, json: bool = False, stream: bool = False, use_tools: bool = True) -> Iterator[str]:
+    def amake_assistant_request(self, json: bool = False, stream: bool = False, use_tools: bool = True) \
+            -> AsyncIterator[str]:
         return self.call_openai_api(json, stream, use_tools)
 
-    def make_request(self, system_message: str = '', request: str = '', json: bool = False, stream: bool = False, use_tools: bool = False) \
-            -> Iterator[str]:
-        self.update_messages(use_system_message=True, system_message=system_message, user_message=request, full_history=None)
+    def amake_request(self, system_message: str = '', request: str = '', json: bool = False, stream: bool = False,
+                      use_tools: bool = False, context: str = '') -> AsyncIterator[str]:
+        prompt = self.pack_prompt(system_message, context, request, use_tools=use_tools)
+        self.update_messages(use_system_message=True, system_message=prompt.system_message,
+                             user_message=prompt.request, full_history=None, context=prompt.context)
         return self.call_openai_api(json, stream, use_tools)
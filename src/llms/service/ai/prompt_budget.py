@@ -0,0 +1,111 @@
+from typing import NamedTuple
+
+from helpers.chunker import DEFAULT_ENCODING, get_counter, trim_to_tokens
+
+DEFAULT_WINDOW = 8192
+DEFAULT_RESERVE = 1024
+# tokens held back for message framing (roles, separators) that the counts do not see
+FRAMING_TOKENS = 32
+
+# context windows by model name prefix, the longest matching prefix wins
+MODEL_WINDOWS = {
+    'gpt-3.5-turbo': 16_385,
+    'gpt-4': 8_192,
+    'gpt-4-turbo': 128_000,
+    'gpt-4o': 128_000,
+    'gpt-4.1': 1_047_576,
+    'gpt-5': 400_000,
+    'o1': 200_000,
+    'o3': 200_000,
+    'o4': 200_000,
+    'claude': 200_000,
+    'gemini-1.5-pro': 2_097_152,
+    'gemini-1.5-flash': 1_048_576,
+    'gemini-2': 1_048_576,
+    'llama3': 8_192,
+    'llama3.1': 131_072,
+    'llama3.2': 131_072,
+    'llama3.3': 131_072,
+}
+
+
+def model_window(model: str) -> int:
+    matches = [prefix for prefix in MODEL_WINDOWS if model.lower().startswith(prefix)]
+    return MODEL_WINDOWS[max(matches, key=len)] if matches else DEFAULT_WINDOW
+
+
+def model_encoding(model: str) -> str:
+    try:
+        import tiktoken
+
+        return tiktoken.encoding_for_model(model).name
+    except Exception:
+        # non OpenAI models have no public tiktoken encoding, cl100k is a close enough estimate
+        return DEFAULT_ENCODING
+
+
+class PackedPrompt(NamedTuple):
+    tone: str
+    system_message: str
+    context: str
+    request: str
+    counts: dict[str, int]
+    trimmed: list[str]
+
+    def report(self) -> str:
+        counts = ', '.join(f'{part} {tokens}' for part, tokens in self.counts.items())
+        trimmed = f" (trimmed {', '.join(self.trimmed)})" if self.trimmed else ''
+        return f'Prompt tokens: {counts}{trimmed}'
+
+
+class PromptBudget:
+    """
+    Fits a prompt in the model's context window minus the `maxTokens` reserved for the answer.
+
+    Parts are packed by priority: tone, request, system message, then retrieved context. A part that does not fit
+    in what is left is trimmed to whole sentences and paragraphs (context therefore loses its trailing documents
+    first).
+    """
+
+    PRIORITY = ('tone', 'request', 'system', 'context')
+
+    def __init__(self, model: str, max_tokens: int | None = None, window: int | None = None) -> None:
+        self.window = window or model_window(model)
+        self.reserve = max_tokens or DEFAULT_RESERVE
+        self.encoding = model_encoding(model)
+        self.counter = get_counter(self.encoding)
+
+    @property
+    def budget(self) -> int:
+        return max(self.window - self.reserve - FRAMING_TOKENS, 0)
+
+    def count(self, text: str) -> int:
+        return self.counter.count(text) if text else 0
+
+    def pack(self, tone: str, system_message: str = '', context: str = '', request: str = '', used: int = 0,
+             fixed: int = 0) -> PackedPrompt:
+        """
+        Pack the parts into the budget. `used` tokens are already taken by conversation history, `fixed` tokens by
+        whatever else the service sends with every request (e.g. tool schemas).
+        """
+        parts = {'tone': tone, 'request': request, 'system': system_message, 'context': context}
+        remaining = self.budget - used - fixed
+        counts: dict[str, int] = {'history': used} if used else {}
+        if fixed:
+            counts['fixed'] = fixed
+        trimmed: list[str] = []
+
+        for name in self.PRIORITY:
+            text, tokens = trim_to_tokens(parts[name], remaining, self.encoding) if parts[name] else ('', 0)
+
+            if text != parts[name]:
+                trimmed.append(name)
+
+            parts[name] = text
+            counts[name] = tokens
+            remaining -= tokens
+
+        counts['total'] = sum(counts.values())
+        counts['budget'] = self.budget
+
+        return PackedPrompt(parts['tone'], parts['system'], parts['context'], parts['request'], counts, trimmed)
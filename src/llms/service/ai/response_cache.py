@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Any
+
+from helpers.lru_cache import LRUCache
+
+from .ai_service import AIConfig, ResponseCacheConfig
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1024
+KEY_PREFIX = 'llm:'
+
+
+class ResponseCache(ABC):
+    """Stores the chunks of complete model responses under a request key"""
+
+    @abstractmethod
+    async def get(self, key: str) -> list[str] | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, chunks: list[str]) -> None:
+        raise NotImplementedError
+
+
+class MemoryResponseCache(ResponseCache):
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL) -> None:
+        self.__entries: LRUCache[list[str]] = LRUCache(max_entries, ttl)
+
+    async def get(self, key: str) -> list[str] | None:
+        return self.__entries.get(key)
+
+    async def set(self, key: str, chunks: list[str]) -> None:
+        self.__entries.put(key, chunks)
+
+
+class RedisResponseCache(ResponseCache):
+    """
+    Redis backed cache with an in-process LRU fallback: while Redis is unreachable (connection or timeout errors)
+    entries are read from and written to the fallback, so a cache outage never fails a request.
+    """
+
+    def __init__(self, url: str, ttl: int = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        import redis.asyncio as redis
+        from redis.exceptions import ConnectionError, TimeoutError
+
+        self.ttl = ttl
+        self.fallback = MemoryResponseCache(max_entries, ttl)
+        self.__errors = (ConnectionError, TimeoutError, OSError)
+        self.__warned = False
+        self.__client = redis.Redis.from_url(url)
+
+    def __unavailable(self, e: Exception) -> None:
+        if not self.__warned:
+            print(f'*** redis response cache unavailable, using the in-process cache: {e} ***')
+            self.__warned = True
+
+    async def get(self, key: str) -> list[str] | None:
+        try:
+            value = await self.__client.get(key)
+        except self.__errors as e:
+            self.__unavailable(e)
+            return await self.fallback.get(key)
+
+        return json.loads(value) if value is not None else await self.fallback.get(key)
+
+    async def set(self, key: str, chunks: list[str]) -> None:
+        try:
+            await self.__client.set(key, json.dumps(chunks), ex=int(self.ttl))
+        except self.__errors as e:
+            self.__unavailable(e)
+            await self.fallback.set(key, chunks)
+
+
+def create_response_cache(config: ResponseCacheConfig) -> ResponseCache | None:
+    backend = config.get('backend', 'memory')
+    ttl = config.get('ttl', DEFAULT_TTL)
+
+    match backend:
+        case 'none':
+            return None
+        case 'memory':
+            return MemoryResponseCache(config.get('maxEntries', DEFAULT_MAX_ENTRIES), ttl)
+        case 'redis':
+            return RedisResponseCache(config.get('redisUrl', os.getenv('REDIS_URL', 'redis://localhost:6379')), ttl,
+                                      config.get('maxEntries', DEFAULT_MAX_ENTRIES))
+        case _:
+            raise ValueError(f'unknown response cache backend {backend}')
+
+
+def request_key(config: AIConfig, tone: str, **request: Any) -> str:
+    """
+    Canonical hash of everything that shapes the response: library, endpoint, model, sampling settings, tone and
+    the request itself (system message, context, user request, json, and stream since some services format
+    streamed output differently).
+    """
+    canonical = {
+        'library': config['library'].upper(),
+        'baseUrl': config.get('baseUrl', ''),
+        'model': config['model'],
+        'temperature': config.get('temperature'),
+        'maxTokens': config.get('maxTokens'),
+        'tone': tone,
+        **request
+    }
+
+    encoded = json.dumps(canonical, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return KEY_PREFIX + hashlib.sha256(encoded.encode()).hexdigest()
+
+
+async def replay(chunks: list[str]) -> AsyncIterator[str]:
+    for chunk in chunks:
+        yield chunk
+
+
+async def record(response: AsyncIterator[str], cache: ResponseCache, key: str) -> AsyncIterator[str]:
+    """Pass the response through and cache its chunks once it has completed"""
+    chunks = []
+
+    async for chunk in response:
+        chunks.append(chunk)
+        yield chunk
+
+    await cache.set(key, chunks)
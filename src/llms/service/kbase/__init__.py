@@ -2,6 +2,8 @@ from .dir_knowledge_service import DirKnowledgeService
 
 from .kbase_service import KBaseService, KBaseConfig, KBaseType
 from .vector_service import VectorService
+from .mmap_service import MMapVectorService
+from .context_cache import ContextCache
 
 
 def get_kbase_service(config: KBaseConfig) -> KBaseService:
@@ -12,3 +14,5 @@ def get_kbase_service(config: KBaseConfig) -> KBaseService:
             return DirKnowledgeService(config)
         case KBaseType.VECTOR:
             return VectorService(config)
+        case KBaseType.MMAP:
+            return MMapVectorService(config)
@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+import os
+import re
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from helpers import CACHE_DIR
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text for keyword matching"""
+    return re.sub(r'[^\w\s]', '', text.lower())
+
+
+class CategoryIndex:
+    """
+    Precomputed category lookup used by category inference.
+
+    Category names are normalized and tokenized once. Embeddings are requested in a single batch, stored as
+    a row-normalized float32 matrix and persisted under ~/.llms/cache in a file named after the embed model and
+    the exact category set, so any change to the categories builds a fresh index.
+    """
+
+    def __init__(self, categories: list[str], embed_model: str, directory: str = CACHE_DIR) -> None:
+        self.categories: list[str] = sorted(set(categories))
+        self.names: list[str] = [normalize_text(category) for category in self.categories]
+        self.word_counts = np.array([max(len(set(name.split())), 1) for name in self.names], dtype=np.float32)
+        self.postings: dict[str, list[int]] = {}
+
+        for i, name in enumerate(self.names):
+            for word in set(name.split()):
+                self.postings.setdefault(word, []).append(i)
+
+        digest = hashlib.sha256('\n'.join([embed_model, *self.categories]).encode()).hexdigest()[:16]
+        self.path = os.path.join(directory, f'categories-{digest}.npy')
+        self.matrix: np.ndarray | None = None
+        self.__lock = asyncio.Lock()
+
+    @staticmethod
+    def description(category: str) -> str:
+        # Create a representative description for each category
+        return f"Documents and content related to {category}"
+
+    async def build(self, embeddings: Embeddings) -> None:
+        """Load the category matrix from disk, or embed every category in one batch and persist it"""
+        async with self.__lock:
+            if self.matrix is not None or not self.categories:
+                return
+
+            if os.path.exists(self.path):
+                matrix = np.load(self.path)
+                if matrix.shape[0] == len(self.categories):
+                    self.matrix = matrix
+                    return
+
+            vectors = await embeddings.aembed_documents([self.description(category) for category in self.categories])
+            matrix = np.asarray(vectors, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.matrix = matrix / norms
+
+            np.save(self.path, self.matrix)
+
+    def keyword_scores(self, query: str) -> np.ndarray:
+        """
+        Fraction of each category's words found in the query, or 1.0 when the whole category name appears in it
+        """
+        query_normalized = normalize_text(query)
+        scores = np.zeros(len(self.categories), dtype=np.float32)
+
+        for word in set(query_normalized.split()):
+            for i in self.postings.get(word, ()):
+                scores[i] += 1.0
+
+        scores /= self.word_counts
+        exact = np.fromiter((name in query_normalized for name in self.names), dtype=bool, count=len(self.names))
+        scores[exact] = 1.0
+
+        return scores
+
+    def embedding_scores(self, query_embedding: list[float]) -> np.ndarray:
+        """Cosine similarity of the query with every category in one matrix-vector product"""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+
+        if self.matrix is None or norm == 0:
+            return np.zeros(len(self.categories), dtype=np.float32)
+
+        return self.matrix @ (query / norm)
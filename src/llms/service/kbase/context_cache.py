@@ -0,0 +1,116 @@
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+from .kbase_service import KBaseService, ContextCacheConfig
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 600
+DEFAULT_SIMILARITY = 0.95
+
+
+class ContextEntry(NamedTuple):
+    context: str
+    embedding: np.ndarray | None
+    created: float
+
+
+def normalize_query(query: str) -> str:
+    return ' '.join(query.lower().split())
+
+
+class ContextCache:
+    """
+    Cache of formatted knowledge base context in front of `KBaseService.load_context`.
+
+    A query is served from cache when its normalized text was seen before or, for knowledge bases that embed
+    queries, when a cached query's embedding has cosine similarity of at least `similarity`. Entries expire after
+    `ttl` seconds, the least recently used are evicted past `maxEntries`, and everything cached before the
+    knowledge base last changed (its `generation`) is dropped.
+    """
+
+    def __init__(self, kbase: KBaseService, config: ContextCacheConfig) -> None:
+        self.kbase = kbase
+        self.max_entries = config.get('maxEntries', DEFAULT_MAX_ENTRIES)
+        self.ttl = config.get('ttl', DEFAULT_TTL)
+        self.similarity = config.get('similarity', DEFAULT_SIMILARITY)
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.__entries: OrderedDict[str, ContextEntry] = OrderedDict()
+        self.__generation = kbase.generation
+
+    def __expire(self) -> None:
+        if self.__generation != self.kbase.generation:
+            self.__entries.clear()
+            self.__generation = self.kbase.generation
+
+        now = time.monotonic()
+        for key in [key for key, entry in self.__entries.items() if now - entry.created > self.ttl]:
+            del self.__entries[key]
+
+    def __closest(self, embedding: np.ndarray) -> str | None:
+        keys = [key for key, entry in self.__entries.items() if entry.embedding is not None]
+
+        if not keys:
+            return None
+
+        scores = np.stack([self.__entries[key].embedding for key in keys]) @ embedding
+        best = int(np.argmax(scores))
+
+        return keys[best] if scores[best] >= self.similarity else None
+
+    async def load_context(self, request: str) -> str:
+        if self.max_entries <= 0:
+            return await self.kbase.load_context(request)
+
+        self.__expire()
+        key = normalize_query(request)
+
+        if key in self.__entries:
+            self.hits += 1
+            self.__entries.move_to_end(key)
+            return self.__entries[key].context
+
+        embedding = None
+        vector = await self.kbase.embed_query(request)
+
+        if vector is not None:
+            embedding = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(embedding)
+            embedding = embedding / norm if norm else None
+
+        if embedding is not None:
+            closest = self.__closest(embedding)
+
+            if closest is not None:
+                self.hits += 1
+                self.semantic_hits += 1
+                self.__entries.move_to_end(closest)
+                return self.__entries[closest].context
+
+        self.misses += 1
+        # the lookup embedding is reused, without an embedding cache the request would be embedded twice
+        context = await self.kbase.load_context(request, embedding=vector)
+
+        # loading may have ingested new content, drop what was cached before it
+        self.__expire()
+        self.__entries[key] = ContextEntry(context, embedding, time.monotonic())
+
+        while len(self.__entries) > self.max_entries:
+            self.__entries.popitem(last=False)
+
+        return context
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+
+        return {
+            'entries': len(self.__entries),
+            'hits': self.hits,
+            'semanticHits': self.semantic_hits,
+            'misses': self.misses,
+            'hitRate': self.hits / lookups if lookups else 0.0
+        }
@@ -1,42 +1,133 @@
+import asyncio
+import hashlib
+import json
 import os
 from pathlib import Path
 
-from helpers.chunker import chunk_file
+from helpers import CACHE_DIR
+from helpers.bm25 import BM25Index, tokenize
+from helpers.chunker import chunk_file, read_chunk
+from helpers.lru_cache import LRUCache
 from .kbase_service import KBaseService, DirKnowledgeConfig
 
+CHUNK_TOKENS = 256
+CHUNK_OVERLAP = 32
+DEFAULT_TOP_N = 3
+DEFAULT_CHUNK_CACHE_BYTES = 32 * 1024 * 1024
+
 
 class DirKnowledgeService(KBaseService):
+    """
+    Directory knowledge base searched with BM25.
+
+    Every file is chunked once and its chunks indexed as token -> (chunk, frequency) postings, with the file name
+    counted as part of each chunk. The index is persisted under ~/.llms/cache and reused while no file changed.
+    Only chunk byte ranges live in the index; chunk text is read back on demand and kept in a byte-capped LRU.
+    """
+
     def __init__(self, config: DirKnowledgeConfig) -> None:
         super().__init__(config)
-        self.knowledge: dict[str, str] = {}
-        self.opened: set[str] = set()
+        self.files: list[str] = []
+        self.chunks: list[tuple[int, int, int]] = []
+        self.index = BM25Index()
+        self.chunk_cache: LRUCache[str] = LRUCache(max_entries=1_000_000,
+                                                  max_size=config.get('chunkCacheBytes', DEFAULT_CHUNK_CACHE_BYTES),
+                                                  sizeof=lambda text: len(text.encode('utf-8')))
+        self.index_path = os.path.join(CACHE_DIR, f"{config['name']}.dirindex.json")
 
-        for root, dirs, files in os.walk(config['location']):
+        files = []
+        for root, dirs, names in os.walk(config['location']):
             dirs[:] = [d for d in dirs if not d.startswith('.')]
-            files = [f for f in files if not f.startswith('.')]
-            for file in files:
-                name = Path(file).stem
-                file_path = os.path.join(root, file)
-                self.knowledge[name.lower()] = file_path
-                self.knowledge[root.lower()] = self.knowledge.get(file, '') + '\n\n'+ self.knowledge[name.lower()]
+            files.extend(os.path.join(root, name) for name in names if not name.startswith('.'))
+
+        signature = self.__signature(sorted(files))
+
+        if not self.__load(signature):
+            self.__build(sorted(files))
+            self.__save(signature)
+
+    @staticmethod
+    def __signature(files: list[str]) -> str:
+        digest = hashlib.sha256(f'{CHUNK_TOKENS}:{CHUNK_OVERLAP}'.encode())
+
+        for path in files:
+            stat = os.stat(path)
+            digest.update(f'\0{path}\0{stat.st_size}\0{stat.st_mtime}'.encode())
+
+        return digest.hexdigest()
+
+    def __build(self, files: list[str]) -> None:
+        for path in files:
+            title = tokenize(Path(path).stem)
+            file_id = len(self.files)
+            chunks = []
+
+            try:
+                for chunk in chunk_file(path, CHUNK_TOKENS, CHUNK_OVERLAP):
+                    chunks.append((chunk.start, chunk.end, title + tokenize(chunk.text)))
+            except (OSError, UnicodeDecodeError) as e:
+                print(f'*** unable to index {path}: {e} ***')
+                continue
+
+            self.files.append(path)
+            for start, end, tokens in chunks:
+                self.index.add(tokens)
+                self.chunks.append((file_id, start, end))
+
+        print(f"Indexed {len(self.chunks)} chunks from {len(self.files)} files in {self.config['location']}")
+
+    def __load(self, signature: str) -> bool:
+        if not os.path.exists(self.index_path):
+            return False
+
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'*** unable to read directory index {self.index_path}, rebuilding: {e} ***')
+            return False
+
+        if data.get('signature') != signature:
+            return False
+
+        self.files = data['files']
+        self.chunks = [tuple(chunk) for chunk in data['chunks']]
+        self.index = BM25Index.from_dict(data['index'])
+
+        return True
+
+    def __save(self, signature: str) -> None:
+        tmp_path = f'{self.index_path}.tmp'
+
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'signature': signature, 'files': self.files, 'chunks': self.chunks,
+                       'index': self.index.to_dict()}, f)
+
+        os.replace(tmp_path, self.index_path)
+
+    def __chunk_texts(self, chunk_ids: list[int]) -> dict[int, str]:
+        texts = {}
+
+        for chunk_id in chunk_ids:
+            text = self.chunk_cache.get(chunk_id)
 
-    def load_context(self, request: str) -> str:
-        words = request.lower().split()
+            if text is None:
+                file_id, start, end = self.chunks[chunk_id]
+                text = read_chunk(self.files[file_id], start, end)
+                self.chunk_cache.put(chunk_id, text)
 
-        context = []
-        for word in words:
-            if word in self.knowledge and word not in self.opened:
-                path = self.knowledge[word]
+            texts[chunk_id] = text
 
-                self.knowledge[word] = ''
+        return texts
 
-                for chunk in chunk_file(path, 1000, 200):
-                    self.knowledge[word] += chunk
+    async def load_context(self, request: str, embedding: list[float] | None = None) -> str:
+        results = self.index.search(request, self.config.get('topN', DEFAULT_TOP_N))
 
-                self.opened.add(word)
+        if not results:
+            return ''
 
-                context.append(word)
-            elif word in self.knowledge:
-                context.append(self.knowledge[word])
+        texts = await asyncio.to_thread(self.__chunk_texts, [chunk_id for chunk_id, _ in results])
+        location = self.config['location']
 
-        return '\n\n'.join(context)
+        return '\n\n'.join(f'[{os.path.relpath(self.files[self.chunks[chunk_id][0]], location)}]\n{texts[chunk_id]}'
+                           for chunk_id, _ in results)
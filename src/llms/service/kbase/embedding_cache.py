@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from helpers import CACHE_DIR
+
+from .kbase_service import EmbeddingCacheConfig
+
+DEFAULT_MAX_ENTRIES = 50_000
+SQLITE_BATCH_SIZE = 500
+
+
+class EmbeddingStore(ABC):
+    """Batch key/value store for serialized embedding vectors"""
+
+    @abstractmethod
+    def mget(self, keys: list[str]) -> list[bytes | None]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def mset(self, items: dict[str, bytes]) -> None:
+        raise NotImplementedError
+
+
+class MemoryEmbeddingStore(EmbeddingStore):
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.__entries: OrderedDict[str, bytes] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def mget(self, keys: list[str]) -> list[bytes | None]:
+        with self.__lock:
+            values = []
+            for key in keys:
+                value = self.__entries.get(key)
+                if value is not None:
+                    self.__entries.move_to_end(key)
+                values.append(value)
+            return values
+
+    def mset(self, items: dict[str, bytes]) -> None:
+        with self.__lock:
+            self.__entries.update(items)
+            for key in items:
+                self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+
+class SQLiteEmbeddingStore(EmbeddingStore):
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB, last_access REAL)")
+        self.__connection.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self.__connection.commit()
+        self.__count = self.__connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def mget(self, keys: list[str]) -> list[bytes | None]:
+        found: dict[str, bytes] = {}
+
+        with self.__lock:
+            for start in range(0, len(keys), SQLITE_BATCH_SIZE):
+                batch = keys[start:start + SQLITE_BATCH_SIZE]
+                rows = self.__connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch)
+                found.update(rows.fetchall())
+
+            if found:
+                now = time.time()
+                self.__connection.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?",
+                                              [(now, key) for key in found])
+                self.__connection.commit()
+
+        return [found.get(key) for key in keys]
+
+    def mset(self, items: dict[str, bytes]) -> None:
+        now = time.time()
+
+        with self.__lock:
+            cursor = self.__connection.executemany(
+                "INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?)",
+                [(key, vector, now) for key, vector in items.items()])
+            self.__count += max(cursor.rowcount, 0)
+
+            if self.__count > self.max_entries:
+                evicted = self.__connection.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (self.__count - self.max_entries,))
+                self.__count -= max(evicted.rowcount, 0)
+
+            self.__connection.commit()
+
+
+class RedisEmbeddingStore(EmbeddingStore):
+    """
+    Redis backed store. Every key expires after `ttl` seconds; size is otherwise bounded by the server's
+    maxmemory policy (redis-stack in docker-compose evicts with allkeys-lru once configured).
+    """
+
+    def __init__(self, url: str, ttl: int = 30 * 24 * 60 * 60) -> None:
+        import redis
+
+        self.ttl = ttl
+        self.__client = redis.Redis.from_url(url)
+
+    def mget(self, keys: list[str]) -> list[bytes | None]:
+        return self.__client.mget(keys) if keys else []
+
+    def mset(self, items: dict[str, bytes]) -> None:
+        pipeline = self.__client.pipeline(transaction=False)
+        for key, vector in items.items():
+            pipeline.set(key, vector, ex=self.ttl)
+        pipeline.execute()
+
+
+def create_embedding_store(config: EmbeddingCacheConfig, namespace: str) -> EmbeddingStore | None:
+    backend = config.get('backend', 'sqlite')
+    max_entries = config.get('maxEntries', DEFAULT_MAX_ENTRIES)
+
+    match backend:
+        case 'none':
+            return None
+        case 'memory':
+            return MemoryEmbeddingStore(max_entries)
+        case 'redis':
+            return RedisEmbeddingStore(config.get('redisUrl', os.getenv('REDIS_URL', 'redis://localhost:6379')))
+        case 'sqlite':
+            return SQLiteEmbeddingStore(os.path.join(CACHE_DIR, f'{namespace}.embeddings.sqlite'), max_entries)
+        case _:
+            raise ValueError(f'unknown embedding cache backend {backend}')
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding service with a content addressed cache keyed by (embed model, sha256 of the text).
+    Only texts missing from the cache are sent upstream, in one batch.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, store: EmbeddingStore) -> None:
+        self.embeddings = embeddings
+        self.model = model
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> str:
+        return 'emb:' + hashlib.sha256(f'{self.model}\0{text}'.encode()).hexdigest()
+
+    def __lookup(self, texts: list[str]) -> tuple[list[str], list[list[float] | None]]:
+        keys = [self._key(text) for text in texts]
+        vectors = [np.frombuffer(value, dtype=np.float32).tolist() if value is not None else None
+                   for value in self.store.mget(keys)]
+        return keys, vectors
+
+    def __missing(self, texts: list[str], keys: list[str], vectors: list[list[float] | None]) -> dict[str, str]:
+        missing = {key: text for key, text, vector in zip(keys, texts, vectors) if vector is None}
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return missing
+
+    def __fill(self, keys: list[str], vectors: list[list[float] | None],
+               embedded: dict[str, list[float]]) -> list[list[float]]:
+        if embedded:
+            self.store.mset({key: np.asarray(vector, dtype=np.float32).tobytes() for key, vector in embedded.items()})
+
+        return [vector if vector is not None else embedded[key] for key, vector in zip(keys, vectors)]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, vectors = self.__lookup(texts)
+        missing = self.__missing(texts, keys, vectors)
+        embedded = dict(zip(missing, self.embeddings.embed_documents(list(missing.values())))) if missing else {}
+
+        return self.__fill(keys, vectors, embedded)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, vectors = await asyncio.to_thread(self.__lookup, texts)
+        missing = self.__missing(texts, keys, vectors)
+        embedded = dict(zip(missing, await self.embeddings.aembed_documents(list(missing.values())))) \
+            if missing else {}
+
+        return await asyncio.to_thread(self.__fill, keys, vectors, embedded)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,34 @@
+import hashlib
+from typing import Sequence
+
+from langchain_core.documents import Document
+
+DEFAULT_RRF_K = 60
+
+
+def fusion_key(doc: Document) -> str:
+    return doc.id or doc.metadata.get('document_id') or hashlib.md5(doc.page_content.encode()).hexdigest()
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Document]], weights: Sequence[float],
+                           rrf_k: int = DEFAULT_RRF_K) -> list[Document]:
+    """
+    Fuse ranked lists with weighted reciprocal rank fusion: score(d) = sum(weight / (rrf_k + rank(d))).
+
+    Only ranks are used, so dense distances and full-text ranks need no calibration against each other. The
+    fused score is stored in each document's metadata as `rrf_score`.
+    """
+    scores: dict[str, float] = {}
+    documents: dict[str, Document] = {}
+
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc in enumerate(ranking, start=1):
+            key = fusion_key(doc)
+            scores[key] = scores.get(key, 0.0) + weight / (rrf_k + rank)
+            documents.setdefault(key, doc)
+
+    fused = sorted(scores, key=scores.get, reverse=True)
+
+    return [Document(page_content=documents[key].page_content, id=documents[key].id,
+                     metadata={**documents[key].metadata, 'rrf_score': scores[key]})
+            for key in fused]
@@ -0,0 +1,116 @@
+import json
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from .kbase_service import VectorIndexConfig
+from .vector_index import create_vector_index, index_name, search_settings
+from .vector_service import VectorService
+
+BENCHMARK_INDEX_NAME = 'benchmark_idx'
+
+
+async def sample_query_vectors(service: VectorService, sample: int, queries: list[str] | None = None) -> list[str]:
+    """
+    Query vectors as pgvector literals: the embedded `queries` when given, otherwise `sample` stored embeddings
+    """
+    store = await service.get_vector_store()
+
+    if queries:
+        return [json.dumps(vector) for vector in await service._embeddings.aembed_documents(queries)]
+
+    sql = (f'SELECT CAST("{store.embedding_column}" AS text) FROM "{store.schema_name}"."{store.table_name}" '
+           f'ORDER BY random() LIMIT :sample')
+
+    async with store.engine.connect() as conn:
+        return [row[0] for row in await conn.execute(text(sql), {'sample': sample})]
+
+
+async def _search(service: VectorService, vectors: list[str], k: int,
+                  settings: dict[str, int | str]) -> tuple[list[list[str]], list[float]]:
+    store = service.store
+    sql = (f'SELECT "{store.id_column}" FROM "{store.schema_name}"."{store.table_name}" '
+           f'ORDER BY "{store.embedding_column}" <=> CAST(:vector AS vector) LIMIT :k')
+    results, latencies = [], []
+
+    async with store.engine.connect() as conn:
+        for vector in vectors:
+            async with conn.begin():
+                for setting, value in settings.items():
+                    await conn.execute(text(f'SET LOCAL {setting} = {value}'))
+
+                started = time.perf_counter()
+                rows = await conn.execute(text(sql), {'vector': vector, 'k': k})
+                results.append([str(row[0]) for row in rows])
+                latencies.append(time.perf_counter() - started)
+
+    return results, latencies
+
+
+async def _index_size(service: VectorService, name: str) -> int:
+    sql = 'SELECT pg_relation_size(to_regclass(:name))'
+
+    async with service.store.engine.connect() as conn:
+        return (await conn.execute(text(sql), {'name': f'"{service.store.schema_name}"."{name}"'})).scalar() or 0
+
+
+async def benchmark_indexes(service: VectorService, candidates: list[VectorIndexConfig], sample: int = 100,
+                            k: int = 10, queries: list[str] | None = None) -> list[dict]:
+    """
+        builds every candidate index in turn and reports build time, index size, recall@k against exact search
+        and p50/p95/p99 query latency. the configured index is rebuilt afterwards.
+    """
+    store = await service.get_vector_store()
+    vectors = await sample_query_vectors(service, sample, queries)
+
+    if not vectors:
+        print('No vectors to benchmark, ingest the knowledge base first')
+        return []
+
+    for name in {index_name(service.index_config), BENCHMARK_INDEX_NAME}:
+        await store.adrop_vector_index(name)
+
+    # sequential scan gives the exact neighbours
+    exact, exact_latencies = await _search(service, vectors, k, {'enable_indexscan': 'off'})
+    results = [_result('exact', 0.0, 0, exact, exact, exact_latencies, k)]
+
+    try:
+        for candidate in candidates:
+            index = create_vector_index(candidate, BENCHMARK_INDEX_NAME)
+
+            started = time.perf_counter()
+            await store.aapply_vector_index(index)
+            build_time = time.perf_counter() - started
+
+            size = await _index_size(service, BENCHMARK_INDEX_NAME)
+            found, latencies = await _search(service, vectors, k, search_settings(candidate))
+            results.append(_result(_describe(candidate), build_time, size, found, exact, latencies, k))
+
+            await store.adrop_vector_index(BENCHMARK_INDEX_NAME)
+    finally:
+        await store.adrop_vector_index(BENCHMARK_INDEX_NAME)
+        await service._create_index()
+
+    return results
+
+
+def _describe(config: VectorIndexConfig) -> str:
+    params = ','.join(f'{key}={value}' for key, value in config.items() if key != 'type')
+    return f"{config.get('type', 'hnsw')}:{params}" if params else config.get('type', 'hnsw')
+
+
+def _result(name: str, build_time: float, size: int, found: list[list[str]], exact: list[list[str]],
+            latencies: list[float], k: int) -> dict:
+    recall = np.mean([len(set(got) & set(want)) / max(min(k, len(want)), 1) for got, want in zip(found, exact)])
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+
+    return {
+        'index': name,
+        'buildSec': build_time,
+        'sizeMb': size / (1024 * 1024),
+        f'recall@{k}': float(recall),
+        'p50Ms': float(p50),
+        'p95Ms': float(p95),
+        'p99Ms': float(p99)
+    }
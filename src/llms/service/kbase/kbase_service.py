@@ -1,20 +1,54 @@
 from enum import Enum
-from typing import TypedDict, Required, Union, Literal
+from typing import TypedDict, Required, NotRequired, Union, Literal
 
 from abc import abstractmethod, ABC
 
 class KBaseType(Enum):
     DIRECTORY = 'DIRECTORY'
     VECTOR = 'VECTOR'
+    MMAP = 'MMAP'
+
+class ContextCacheConfig(TypedDict):
+    maxEntries: NotRequired[int]
+    ttl: NotRequired[float]
+    similarity: NotRequired[float]
 
 class BaseConfig(TypedDict):
     name: Required[str]
+    contextCache: NotRequired[ContextCacheConfig]
 
 class DirKnowledgeConfig(BaseConfig):
     name: Required[str]
     location: Required[str]
     type: Literal[KBaseType.DIRECTORY]
     metadata: Required[list[str]]
+    topN: NotRequired[int]
+    chunkCacheBytes: NotRequired[int]
+
+class EmbeddingCacheConfig(TypedDict):
+    backend: Literal['sqlite', 'memory', 'redis', 'none']
+    maxEntries: NotRequired[int]
+    redisUrl: NotRequired[str]
+
+class RerankerConfig(TypedDict):
+    backend: Literal['cohere', 'bm25', 'none']
+    cacheSize: NotRequired[int]
+
+class HybridSearchConfig(TypedDict):
+    denseK: NotRequired[int]
+    lexicalK: NotRequired[int]
+    denseWeight: NotRequired[float]
+    lexicalWeight: NotRequired[float]
+    rrfK: NotRequired[int]
+    language: NotRequired[str]
+
+class VectorIndexConfig(TypedDict):
+    type: Literal['hnsw', 'ivfflat']
+    m: NotRequired[int]
+    efConstruction: NotRequired[int]
+    efSearch: NotRequired[int]
+    lists: NotRequired[int]
+    probes: NotRequired[int]
 
 class VectorStoreConfig(BaseConfig):
     connectionStr: Required[str]
@@ -25,14 +59,50 @@ class VectorStoreConfig(BaseConfig):
     tableName: Required[str]
     metadataJsonColumn: Required[str]
     metadataColumns: Required[list[str]]
+    ingestWorkers: NotRequired[int]
+    ingestTimeout: NotRequired[float]
+    ingestBatchSize: NotRequired[int]
+    chunkTokens: NotRequired[int]
+    embeddingCache: NotRequired[EmbeddingCacheConfig]
+    reranker: NotRequired[RerankerConfig]
+    hybridSearch: NotRequired[HybridSearchConfig]
+    index: NotRequired[VectorIndexConfig]
 
-KBaseConfig = Union[DirKnowledgeConfig, VectorStoreConfig]
+class IVFConfig(TypedDict):
+    lists: NotRequired[int]
+    probes: NotRequired[int]
+    minVectors: NotRequired[int]
+
+class MMapStoreConfig(BaseConfig):
+    type: Literal[KBaseType.MMAP]
+    location: Required[str]
+    embedModel: Required[str]
+    tableName: Required[str]
+    topN: Required[int]
+    reRankModel: NotRequired[str]
+    ingestWorkers: NotRequired[int]
+    ingestTimeout: NotRequired[float]
+    ingestBatchSize: NotRequired[int]
+    chunkTokens: NotRequired[int]
+    embeddingCache: NotRequired[EmbeddingCacheConfig]
+    reranker: NotRequired[RerankerConfig]
+    ivf: NotRequired[IVFConfig]
+
+KBaseConfig = Union[DirKnowledgeConfig, VectorStoreConfig, MMapStoreConfig]
 
 class KBaseService(ABC):
+    # bumped whenever the indexed content changes, contexts cached before that are stale
+    generation: int = 0
+
     @abstractmethod
     def __init__(self, config: KBaseConfig) -> None:
         self.config: KBaseConfig = config
 
     @abstractmethod
-    async def load_context(self, request: str) -> str:
+    async def load_context(self, request: str, embedding: list[float] | None = None) -> str:
+        """Context for the request, `embedding` is its `embed_query` result when the caller already has it"""
         raise NotImplementedError
+
+    async def embed_query(self, request: str) -> list[float] | None:
+        """Embedding of the request for semantic cache lookups, None when the knowledge base does not embed"""
+        return None
@@ -0,0 +1,172 @@
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+from langchain_community.document_loaders import UnstructuredMarkdownLoader, PyMuPDFLoader, \
+    UnstructuredWordDocumentLoader, TextLoader
+from langchain_core.documents import Document
+
+from helpers.chunker import chunk_text
+
+# extensions load_file has a loader for, anything else parses to no documents
+SUPPORTED_EXTENSIONS = ('.md', '.pdf', '.docx', '.txt', '.csv')
+
+
+def split_documents(docs: list[Document], max_tokens: int) -> list[Document]:
+    """Split documents into chunks of at most `max_tokens` tokens, recording each chunk's byte range"""
+    split = []
+
+    for doc in docs:
+        for chunk in chunk_text(doc.page_content, max_tokens, max_tokens // 8):
+            split.append(Document(page_content=chunk.text,
+                                  metadata={**doc.metadata, 'chunk_start': chunk.start, 'chunk_end': chunk.end,
+                                            'chunk_tokens': chunk.tokens}))
+
+    return split
+
+
+def load_file(path: str, category: str, chunk_tokens: int | None = None) -> list[Document]:
+    """
+    Parse a single file into documents, split into token sized chunks when `chunk_tokens` is set.
+    Module level so process pool workers can run it.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    loaded_docs = []
+
+    if ext == ".md":
+        for d in UnstructuredMarkdownLoader(path).load():
+            loaded_docs.append(d)
+    elif ext == ".pdf":
+        for d in PyMuPDFLoader(path).load():
+            loaded_docs.append(d)
+    elif ext == ".docx":
+        for d in UnstructuredWordDocumentLoader(path).load():
+            loaded_docs.append(d)
+    elif ext == ".txt":
+        for d in TextLoader(path).load():
+            loaded_docs.append(d)
+    elif ext == '.csv':
+        df = pd.read_csv(path)
+        df = df.replace({np.nan: None})
+
+        filename = os.path.basename(path)
+
+        for row_num, (_, row) in enumerate(df.iterrows()):
+            row_dict = row.to_dict()
+
+            row_text = f"Record from {filename}:\n"
+            row_text += "\n".join([
+                f"{col}: {val}" for col, val in row_dict.items()
+                if val is not None
+            ])
+
+            doc = Document(
+                page_content=row_text,
+                metadata={
+                    "source": path,
+                    "row_number": row_num,  # This is a proper int
+                    "csv_data": row_dict
+                }
+            )
+            loaded_docs.append(doc)
+
+    for d in loaded_docs:
+        d.metadata["category"] = category
+        d.metadata['file_type'] = ext
+
+    if chunk_tokens:
+        return split_documents(loaded_docs, chunk_tokens)
+
+    return loaded_docs
+
+
+def _report_failure(path: str, error: BaseException | None = None) -> None:
+    print(f"INGEST ERROR: failed to load {path}")
+    if error:
+        traceback.print_exception(error)
+
+
+def parse_files(files: Iterable[tuple[str, str]], workers: int = 1, timeout: float | None = None,
+                chunk_tokens: int | None = None) -> Iterator[tuple[str, list[Document] | None]]:
+    """
+    Parse (path, category) pairs, yielding (path, documents) as each file finishes.
+    A file that fails or runs past `timeout` seconds is reported and yielded with None.
+
+    With workers > 1 files are parsed in a process pool with at most `workers` files in flight, so results stream
+    back in completion order. A timed out worker cannot be interrupted, so the pool is torn down and the other
+    in flight files are resubmitted to a fresh one. The serial path (workers <= 1) does not enforce timeouts.
+    """
+    if workers <= 1:
+        for path, category in files:
+            try:
+                yield path, load_file(path, category, chunk_tokens)
+            except Exception as e:
+                _report_failure(path, e)
+                yield path, None
+        return
+
+    pending = iter(files)
+    completed: queue.Queue = queue.Queue()
+    in_flight: dict[str, tuple[str, float]] = {}
+    generation = 0
+
+    def submit(target_pool, path: str, category: str) -> None:
+        submitted_generation = generation
+        in_flight[path] = (category, time.monotonic() + timeout if timeout else float('inf'))
+        target_pool.apply_async(
+            load_file, (path, category, chunk_tokens),
+            callback=lambda docs: completed.put((submitted_generation, path, docs, None)),
+            error_callback=lambda error: completed.put((submitted_generation, path, None, error)))
+
+    pool = multiprocessing.Pool(workers)
+
+    try:
+        while True:
+            while len(in_flight) < workers:
+                next_file = next(pending, None)
+                if next_file is None:
+                    break
+                submit(pool, *next_file)
+
+            if not in_flight:
+                break
+
+            deadline = min(file_deadline for _, file_deadline in in_flight.values())
+
+            try:
+                result_generation, path, docs, error = completed.get(
+                    timeout=max(deadline - time.monotonic(), 0) if deadline != float('inf') else None)
+            except queue.Empty:
+                now = time.monotonic()
+                expired = [path for path, (_, file_deadline) in in_flight.items() if file_deadline <= now]
+
+                for path in expired:
+                    del in_flight[path]
+                    print(f"INGEST ERROR: failed to load {path} (timed out after {timeout}s)")
+                    yield path, None
+
+                pool.terminate()
+                pool = multiprocessing.Pool(workers)
+                generation += 1
+
+                for path, (category, _) in list(in_flight.items()):
+                    submit(pool, path, category)
+                continue
+
+            if result_generation != generation or path not in in_flight:
+                continue
+
+            del in_flight[path]
+
+            if error:
+                _report_failure(path, error)
+                yield path, None
+            else:
+                yield path, docs
+    finally:
+        pool.terminate()
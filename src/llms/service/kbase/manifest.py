@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import time
+from typing import TypedDict, Required, NotRequired, NamedTuple
+
+
+class ManifestEntry(TypedDict):
+    size: Required[int]
+    mtime: Required[float]
+    hash: Required[str]
+    # documents the file was parsed into, missing from entries recorded before it was tracked
+    documents: NotRequired[int]
+
+
+class ManifestDiff(NamedTuple):
+    unchanged: list[str]
+    modified: list[str]
+    added: list[str]
+    deleted: list[str]
+
+    @property
+    def to_ingest(self) -> list[str]:
+        return self.added + self.modified
+
+    @property
+    def to_remove(self) -> list[str]:
+        return self.modified + self.deleted
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """
+        persisted record of every ingested file (path, size, mtime, content hash).
+
+        a file whose size and mtime are unchanged is trusted without reading it; when they moved the content hash
+        decides, so touching a file does not trigger a re-parse.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.entries: dict[str, ManifestEntry] = {}
+        self.__pending: dict[str, ManifestEntry] = {}
+        self.__saved_at = time.monotonic()
+
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f'*** unable to read ingest manifest {path}, re-ingesting everything: {e} ***')
+
+    def diff(self, paths: list[str]) -> ManifestDiff:
+        unchanged, modified, added = [], [], []
+
+        for path in paths:
+            stat = os.stat(path)
+            entry = self.entries.get(path)
+
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                unchanged.append(path)
+                continue
+
+            content_hash = hash_file(path)
+            self.__pending[path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': content_hash}
+
+            if not entry:
+                added.append(path)
+            elif entry['hash'] == content_hash:
+                # only the stat moved, refresh it without re-ingesting
+                self.entries[path] = self.__pending.pop(path)
+                unchanged.append(path)
+            else:
+                modified.append(path)
+
+        current = set(paths)
+        deleted = [path for path in self.entries if path not in current]
+
+        return ManifestDiff(unchanged, modified, added, deleted)
+
+    def record(self, ingested: dict[str, int]) -> None:
+        """
+            records `ingested` files (path -> documents parsed) as stored, call `save` or `checkpoint` to persist
+        """
+        for path, documents in ingested.items():
+            if path in self.__pending:
+                self.entries[path] = {**self.__pending.pop(path), 'documents': documents}
+
+    def sources(self) -> list[str]:
+        """
+            recorded files that produced at least one document
+        """
+        return [path for path, entry in self.entries.items() if entry.get('documents', 1)]
+
+    def forget(self, removed: list[str]) -> None:
+        for path in removed:
+            self.entries.pop(path, None)
+
+    def checkpoint(self, interval: float = 30.0) -> None:
+        """
+            persists the manifest at most once per `interval` seconds so long ingests can resume
+        """
+        if time.monotonic() - self.__saved_at >= interval:
+            self.save()
+
+    def save(self) -> None:
+        tmp_path = f'{self.path}.tmp'
+
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+
+        os.replace(tmp_path, self.path)
+        self.__saved_at = time.monotonic()
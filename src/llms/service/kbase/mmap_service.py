@@ -0,0 +1,45 @@
+import asyncio
+import os
+
+from helpers import CACHE_DIR
+
+from .kbase_service import MMapStoreConfig
+from .mmap_store import MMapVectorStore
+from .vector_service import VectorService
+
+
+class MMapVectorService(VectorService):
+    """
+    VectorService backed by a local memory-mapped store instead of Postgres.
+
+    Ingestion (manifest, parsing, embedding cache), category inference and reranking are shared with
+    VectorService; only storage, lookups and search are local. Full-text hybrid search is not available.
+    """
+
+    store: MMapVectorStore = None
+    config: MMapStoreConfig
+
+    async def get_vector_store(self) -> MMapVectorStore | None:
+        if self._store_ready:
+            return self.store
+
+        async with self._store_lock:
+            if not self._store_ready:
+                directory = os.path.join(CACHE_DIR, f"{self.config['tableName']}.mmap")
+                self.store = await asyncio.to_thread(MMapVectorStore, directory, self.config.get('ivf'))
+
+                await self.add_docs_to_store()
+                self._store_ready = True
+
+        return self.store
+
+    async def remove_sources(self, sources: list[str]) -> None:
+        """Delete every vector that was ingested from one of the given files"""
+        if not sources:
+            return
+
+        removed = await asyncio.to_thread(self.store.remove_sources, sources)
+        print(f"Removed {removed} stale vectors from {len(sources)} deleted or modified files")
+
+    async def existing_document_ids(self, document_ids: list[str]) -> set[str]:
+        return set(document_ids) & self.store.document_ids
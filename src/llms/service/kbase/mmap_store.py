@@ -0,0 +1,284 @@
+import asyncio
+import json
+import os
+import threading
+import uuid
+from typing import Any, Iterable
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .kbase_service import IVFConfig
+
+DEFAULT_IVF_PROBES = 8
+DEFAULT_IVF_MIN_VECTORS = 50_000
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 256
+ASSIGN_BATCH_SIZE = 65_536
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k >= len(scores):
+        return np.argsort(-scores)
+
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class IVFIndex:
+    """
+    Inverted file index over the normalized matrix: rows are assigned to their nearest k-means centroid and a
+    query only scores the rows of its `probes` nearest lists.
+    """
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray) -> None:
+        self.centroids = centroids
+        self.assignments = assignments
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, lists: int) -> 'IVFIndex':
+        rng = np.random.default_rng(0)
+        sample_size = min(len(matrix), lists * KMEANS_SAMPLE_PER_LIST)
+        sample = np.asarray(matrix[np.sort(rng.choice(len(matrix), sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, lists, replace=False)]
+
+        # spherical k-means, the vectors are unit length so the nearest centroid is the highest dot product
+        for _ in range(KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(lists):
+                members = sample[labels == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        index = cls(centroids.astype(np.float32), np.empty(0, dtype=np.int32))
+        index.add(matrix)
+
+        return index
+
+    def add(self, vectors: np.ndarray) -> None:
+        labels = [np.argmax(np.asarray(vectors[start:start + ASSIGN_BATCH_SIZE]) @ self.centroids.T, axis=1)
+                  for start in range(0, len(vectors), ASSIGN_BATCH_SIZE)]
+        self.assignments = np.concatenate([self.assignments, *labels]).astype(np.int32)
+
+    def candidates(self, query: np.ndarray, probes: int) -> np.ndarray:
+        lists = _top_k(self.centroids @ query, probes)
+        return np.flatnonzero(np.isin(self.assignments, lists))
+
+    def save(self, path: str) -> None:
+        tmp_path = f'{path}.tmp.npz'
+        np.savez(tmp_path, centroids=self.centroids, assignments=self.assignments)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, rows: int) -> 'IVFIndex | None':
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as data:
+            index = cls(data['centroids'], data['assignments'])
+
+        # rows appended after the last save were never assigned, rebuild rather than guess
+        return index if len(index.assignments) == rows else None
+
+
+class MMapVectorStore:
+    """
+    Embedding store in plain files under `directory`:
+
+    * vectors.f32 - row-normalized float32 matrix, memory-mapped for search and appended to on ingest
+    * metadata.jsonl - sidecar with one record (id, content, metadata) per matrix row
+    * ivf.npz - optional approximate index, built once the store reaches `minVectors` rows
+
+    Search is exact brute force (one matrix-vector product) unless the IVF index is enabled. It exposes the
+    subset of the AsyncPGVectorStore interface VectorService relies on.
+    """
+
+    def __init__(self, directory: str, ivf: IVFConfig | None = None) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, 'vectors.f32')
+        self.metadata_path = os.path.join(directory, 'metadata.jsonl')
+        self.info_path = os.path.join(directory, 'store.json')
+        self.ivf_path = os.path.join(directory, 'ivf.npz')
+        self.ivf_config = ivf
+
+        self.dim: int | None = None
+        self.records: list[dict[str, Any]] = []
+        self.document_ids: set[str] = set()
+        self.category_codes: dict[str, int] = {}
+        self.categories = np.empty(0, dtype=np.int32)
+        self.matrix: np.memmap | None = None
+        self.ivf: IVFIndex | None = None
+        self.__lock = threading.RLock()
+
+        self.__load()
+
+    def __load(self) -> None:
+        if os.path.exists(self.info_path):
+            with open(self.info_path, 'r', encoding='utf-8') as f:
+                self.dim = json.load(f)['dim']
+
+        records = []
+        if os.path.exists(self.metadata_path):
+            with open(self.metadata_path, 'r', encoding='utf-8') as f:
+                records = [json.loads(line) for line in f if line.strip()]
+
+        vector_rows = os.path.getsize(self.vectors_path) // (4 * self.dim) \
+            if self.dim and os.path.exists(self.vectors_path) else 0
+        rows = min(vector_rows, len(records))
+
+        # an interrupted append leaves one file longer than the other, drop the unmatched tail
+        if rows < vector_rows:
+            os.truncate(self.vectors_path, rows * 4 * self.dim)
+        if rows < len(records):
+            records = records[:rows]
+            self.__write_records(self.metadata_path, records)
+
+        self.records = []
+        self.document_ids = set()
+        self.category_codes = {}
+        self.categories = np.empty(0, dtype=np.int32)
+        self.__index_records(records)
+        self.__map()
+
+        if self.ivf_config is not None and self.matrix is not None:
+            self.ivf = IVFIndex.load(self.ivf_path, len(self.records))
+
+    def __map(self) -> None:
+        self.matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(len(self.records), self.dim)) \
+            if self.records else None
+
+    def __index_records(self, records: list[dict[str, Any]]) -> None:
+        codes = []
+        for record in records:
+            category = record['metadata'].get('category')
+            codes.append(self.category_codes.setdefault(category, len(self.category_codes)))
+            if record['metadata'].get('document_id'):
+                self.document_ids.add(record['metadata']['document_id'])
+
+        self.records.extend(records)
+        self.categories = np.concatenate([self.categories, np.asarray(codes, dtype=np.int32)])
+
+    @staticmethod
+    def __write_records(path: str, records: Iterable[dict[str, Any]]) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+
+    def add_embeddings(self, texts: list[str], embeddings: list[list[float]],
+                       metadatas: list[dict[str, Any]] | None = None) -> list[str]:
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        metadatas = metadatas or [{} for _ in texts]
+        records = [{'id': uuid.uuid4().hex, 'content': content, 'metadata': metadata}
+                   for content, metadata in zip(texts, metadatas)]
+
+        with self.__lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self.info_path, 'w', encoding='utf-8') as f:
+                    json.dump({'dim': self.dim}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f'embedding dimension {vectors.shape[1]} does not match the store ({self.dim})')
+
+            # vectors first: a crash between the two writes leaves extra vectors, which __load trims
+            with open(self.vectors_path, 'ab') as f:
+                f.write(vectors.tobytes())
+            with open(self.metadata_path, 'a', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+
+            self.__index_records(records)
+            self.__map()
+
+            if self.ivf:
+                self.ivf.add(vectors)
+                self.ivf.save(self.ivf_path)
+
+        return [record['id'] for record in records]
+
+    async def aadd_embeddings(self, texts: list[str], embeddings: list[list[float]],
+                              metadatas: list[dict[str, Any]] | None = None) -> list[str]:
+        return await asyncio.to_thread(self.add_embeddings, texts, embeddings, metadatas)
+
+    def remove_sources(self, sources: list[str]) -> int:
+        """Rewrite the store without the rows ingested from `sources`, returning how many were removed"""
+        removed = set(sources)
+
+        with self.__lock:
+            keep = [i for i, record in enumerate(self.records) if record['metadata'].get('source') not in removed]
+
+            if len(keep) == len(self.records):
+                return 0
+
+            tmp_vectors, tmp_metadata = f'{self.vectors_path}.tmp', f'{self.metadata_path}.tmp'
+            with open(tmp_vectors, 'wb') as f:
+                for start in range(0, len(keep), ASSIGN_BATCH_SIZE):
+                    f.write(np.asarray(self.matrix[keep[start:start + ASSIGN_BATCH_SIZE]]).tobytes())
+            self.__write_records(tmp_metadata, (self.records[i] for i in keep))
+
+            removed_count = len(self.records) - len(keep)
+            self.matrix = None
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_metadata, self.metadata_path)
+
+            # row numbers moved, the IVF assignments are rebuilt on the next search
+            if os.path.exists(self.ivf_path):
+                os.remove(self.ivf_path)
+            self.ivf = None
+            self.__load()
+
+            return removed_count
+
+    def __ivf_candidates(self, query: np.ndarray) -> np.ndarray | None:
+        if self.ivf_config is None or len(self.records) < self.ivf_config.get('minVectors', DEFAULT_IVF_MIN_VECTORS):
+            return None
+
+        if self.ivf is None:
+            lists = self.ivf_config.get('lists') or max(int(np.sqrt(len(self.records))), 1)
+            self.ivf = IVFIndex.build(self.matrix, min(lists, len(self.records)))
+            self.ivf.save(self.ivf_path)
+
+        return self.ivf.candidates(query, self.ivf_config.get('probes', DEFAULT_IVF_PROBES))
+
+    def search(self, embedding: list[float], k: int, category: str | None = None) -> list[tuple[int, float]]:
+        """Top `k` rows by cosine similarity as (row, score) pairs, optionally restricted to one category"""
+        with self.__lock:
+            if self.matrix is None:
+                return []
+
+            query = _normalize(np.asarray(embedding, dtype=np.float32))
+            rows = self.__ivf_candidates(query)
+
+            if category is not None:
+                code = self.category_codes.get(category)
+                if code is None:
+                    return []
+                rows = np.flatnonzero(self.categories == code) if rows is None else rows[self.categories[rows] == code]
+
+            # too few approximate candidates, fall back to exact search over the filtered set
+            if rows is not None and len(rows) < k and self.ivf is not None:
+                rows = np.flatnonzero(self.categories == self.category_codes[category]) \
+                    if category is not None else None
+
+            scores = self.matrix @ query if rows is None else self.matrix[rows] @ query
+            top = _top_k(scores, k)
+
+            return [(int(rows[i]) if rows is not None else int(i), float(scores[i])) for i in top]
+
+    def document(self, row: int, score: float | None = None) -> Document:
+        record = self.records[row]
+        metadata = record['metadata'] if score is None else {**record['metadata'], 'similarity': score}
+        return Document(id=record['id'], page_content=record['content'], metadata=metadata)
+
+    async def asimilarity_search_by_vector(self, embedding: list[float], k: int = 4,
+                                           filter: dict[str, Any] | None = None) -> list[Document]:
+        category = (filter or {}).get('category')
+        hits = await asyncio.to_thread(self.search, embedding, k, category)
+
+        return [self.document(row, score) for row, score in hits]
@@ -0,0 +1,66 @@
+import asyncio
+import time
+from typing import Iterator, AsyncIterator
+
+from langchain_core.documents import Document
+
+
+class IngestProgress:
+    """Running counters for an ingest, printed once per batch"""
+
+    def __init__(self, total_files: int) -> None:
+        self.total_files = total_files
+        self.files = 0
+        self.failed = 0
+        self.documents = 0
+        self.embeddings = 0
+        self.written = 0
+        self.started = time.perf_counter()
+
+    def report(self) -> None:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+
+        print(f"Ingest progress: {self.files}/{self.total_files} files ({self.failed} failed), "
+              f"{self.documents} documents parsed, {self.written} written | "
+              f"{self.documents / elapsed:.1f} docs/sec, {self.embeddings / elapsed:.1f} embeddings/sec")
+
+
+async def document_batches(parsed: Iterator[tuple[str, list[Document] | None]], batch_size: int,
+                           progress: IngestProgress) -> AsyncIterator[tuple[list[Document], dict[str, int]]]:
+    """
+    Regroup parsed files into batches of `batch_size` documents.
+
+    Each batch comes with the paths whose last document is in it (or in an earlier batch), mapped to their
+    document count, so a path can be recorded as ingested once its batch is written. The next file is only pulled once the consumer asks for
+    the next batch, which keeps at most one batch plus the parser's in flight files in memory.
+    """
+    batch: list[Document] = []
+    completed: dict[str, int] = {}
+
+    while True:
+        # the parser blocks on worker processes, keep it off the event loop
+        result = await asyncio.to_thread(next, parsed, None)
+
+        if result is None:
+            break
+
+        path, docs = result
+        progress.files += 1
+
+        if docs is None:
+            progress.failed += 1
+            continue
+
+        progress.documents += len(docs)
+
+        for doc in docs:
+            batch.append(doc)
+
+            if len(batch) >= batch_size:
+                yield batch, completed
+                batch, completed = [], {}
+
+        completed[path] = len(docs)
+
+    if batch or completed:
+        yield batch, completed
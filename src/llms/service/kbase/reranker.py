@@ -0,0 +1,123 @@
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Sequence
+
+from langchain_core.documents import Document
+
+from helpers.bm25 import score_documents
+from helpers.lru_cache import LRUCache
+
+from .kbase_service import RerankerConfig
+
+DEFAULT_CACHE_SIZE = 512
+
+
+def _with_score(doc: Document, score: float | None) -> Document:
+    return Document(page_content=doc.page_content, id=doc.id, metadata={**doc.metadata, 'relevance_score': score})
+
+
+class Reranker(ABC):
+    """Orders candidate documents by relevance to a query, returning at most `top_n`"""
+
+    name: str
+
+    @abstractmethod
+    async def arerank(self, query: str, documents: Sequence[Document], top_n: int) -> list[Document]:
+        raise NotImplementedError
+
+
+class CohereReranker(Reranker):
+    name = 'cohere'
+
+    def __init__(self, model: str) -> None:
+        from langchain_cohere import CohereRerank
+
+        self.model = model
+        self.__compressor = CohereRerank(model=model)
+
+    async def arerank(self, query: str, documents: Sequence[Document], top_n: int) -> list[Document]:
+        self.__compressor.top_n = top_n
+        return list(await self.__compressor.acompress_documents(documents=documents, query=query))
+
+
+class BM25Reranker(Reranker):
+    """
+    Local lexical reranker: BM25 over the candidate set, ties broken by the retrieval order.
+    Needs no network access.
+    """
+
+    name = 'bm25'
+
+    async def arerank(self, query: str, documents: Sequence[Document], top_n: int) -> list[Document]:
+        scores = score_documents(query, [doc.page_content for doc in documents])
+        ranked = sorted(range(len(documents)), key=lambda i: (-scores[i], i))[:top_n]
+
+        return [_with_score(documents[i], scores[i]) for i in ranked]
+
+
+class RerankEngine:
+    """
+    Wraps a reranker with an adaptive skip and an LRU cache.
+
+    Reranking is skipped when there are no more candidates than `top_n`, since every candidate is returned either
+    way. Results are cached by query and the ordered candidate ids, so repeated queries over the same candidates
+    never reach the reranker.
+    """
+
+    def __init__(self, reranker: Reranker | None, top_n: int, cache_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self.reranker = reranker
+        self.top_n = top_n
+        self.cache: LRUCache[list[tuple[int, float | None]]] = LRUCache(cache_size)
+        self.skipped = 0
+
+    @staticmethod
+    def _document_id(doc: Document) -> str:
+        return doc.metadata.get('document_id') or doc.id or hashlib.md5(doc.page_content.encode()).hexdigest()
+
+    def _key(self, query: str, documents: Sequence[Document]) -> str:
+        digest = hashlib.sha256(f'{self.reranker.name}\0{self.top_n}\0{query}'.encode())
+        for doc in documents:
+            digest.update(b'\0' + self._document_id(doc).encode())
+        return digest.hexdigest()
+
+    async def arerank(self, query: str, documents: Sequence[Document]) -> list[Document]:
+        if not self.reranker:
+            return list(documents)
+
+        if len(documents) <= self.top_n:
+            self.skipped += 1
+            return list(documents)
+
+        key = self._key(query, documents)
+        cached = self.cache.get(key)
+
+        if cached is not None:
+            return [_with_score(documents[i], score) for i, score in cached]
+
+        reranked = await self.reranker.arerank(query, documents, self.top_n)
+
+        positions = {self._document_id(doc): i for i, doc in enumerate(documents)}
+        self.cache.put(key, [(positions[self._document_id(doc)], doc.metadata.get('relevance_score'))
+                             for doc in reranked if self._document_id(doc) in positions])
+
+        return reranked
+
+    def stats(self) -> dict[str, int | float]:
+        return {**self.cache.stats(), 'skipped': self.skipped}
+
+
+def create_rerank_engine(config: RerankerConfig, model: str | None, top_n: int) -> RerankEngine:
+    backend = config.get('backend', 'cohere')
+    cache_size = config.get('cacheSize', DEFAULT_CACHE_SIZE)
+
+    match backend:
+        case 'none':
+            reranker = None
+        case 'bm25':
+            reranker = BM25Reranker()
+        case 'cohere':
+            reranker = CohereReranker(model)
+        case _:
+            raise ValueError(f'unknown reranker backend {backend}')
+
+    return RerankEngine(reranker, top_n, cache_size)
@@ -0,0 +1,59 @@
+from langchain_postgres.v2.indexes import (HNSWIndex, IVFFlatIndex, HNSWQueryOptions, IVFFlatQueryOptions,
+                                           DistanceStrategy)
+
+from .kbase_service import VectorIndexConfig
+
+DEFAULT_INDEX: VectorIndexConfig = {'type': 'hnsw', 'm': 16, 'efConstruction': 64}
+
+
+def index_name(config: VectorIndexConfig) -> str:
+    return f"{config.get('type', 'hnsw')}_idx"
+
+
+def create_vector_index(config: VectorIndexConfig, name: str | None = None) -> HNSWIndex | IVFFlatIndex:
+    name = name or index_name(config)
+
+    match config.get('type', 'hnsw'):
+        case 'hnsw':
+            return HNSWIndex(name=name, distance_strategy=DistanceStrategy.COSINE_DISTANCE,
+                             m=config.get('m', 16), ef_construction=config.get('efConstruction', 64))
+        case 'ivfflat':
+            return IVFFlatIndex(name=name, distance_strategy=DistanceStrategy.COSINE_DISTANCE,
+                                lists=config.get('lists', 100))
+        case index_type:
+            raise ValueError(f'unknown vector index type {index_type}')
+
+
+def create_query_options(config: VectorIndexConfig) -> HNSWQueryOptions | IVFFlatQueryOptions | None:
+    if config.get('type', 'hnsw') == 'hnsw' and 'efSearch' in config:
+        return HNSWQueryOptions(ef_search=config['efSearch'])
+
+    if config.get('type') == 'ivfflat' and 'probes' in config:
+        return IVFFlatQueryOptions(probes=config['probes'])
+
+    return None
+
+
+def search_settings(config: VectorIndexConfig) -> dict[str, int]:
+    """Session settings (SET LOCAL) equivalent to the query options, for raw SQL searches"""
+    if config.get('type', 'hnsw') == 'hnsw' and 'efSearch' in config:
+        return {'hnsw.ef_search': config['efSearch']}
+
+    if config.get('type') == 'ivfflat' and 'probes' in config:
+        return {'ivfflat.probes': config['probes']}
+
+    return {}
+
+
+def parse_index_spec(spec: str) -> VectorIndexConfig:
+    """
+        parses `type[:key=value,...]`, e.g. `hnsw:m=32,efConstruction=128,efSearch=80` or `ivfflat:lists=200,probes=10`
+    """
+    index_type, _, params = spec.partition(':')
+    config: VectorIndexConfig = {'type': index_type.strip().lower()}
+
+    for param in filter(None, params.split(',')):
+        key, _, value = param.partition('=')
+        config[key.strip()] = int(value)
+
+    return config
@@ -1,20 +1,32 @@
 import os, glob, traceback, hashlib
+import asyncio
+import json
 import re
+import time
 import numpy as np
-import pandas as pd
 from typing import Union, Sequence, Dict, Any, List
 
-from langchain_cohere import CohereRerank
-from langchain_community.document_loaders import UnstructuredMarkdownLoader, PyMuPDFLoader, \
-    UnstructuredWordDocumentLoader, TextLoader
-from langchain_postgres.v2.indexes import HNSWIndex, DistanceStrategy
 
 from langchain_core.documents import Document
 from langchain_postgres import PGEngine
 from langchain_postgres.v2.async_vectorstore import AsyncPGVectorStore
 from langchain_openai import OpenAIEmbeddings
+from sqlalchemy import text
 
-from .kbase_service import KBaseService, VectorStoreConfig
+from helpers import CACHE_DIR
+
+from .kbase_service import KBaseService, VectorStoreConfig, MMapStoreConfig, VectorIndexConfig
+from .category_index import CategoryIndex
+from .embedding_cache import CachedEmbeddings, create_embedding_store
+from .hybrid import reciprocal_rank_fusion, DEFAULT_RRF_K
+from .loaders import SUPPORTED_EXTENSIONS, parse_files
+from .manifest import IngestManifest, ManifestDiff
+from .pipeline import IngestProgress, document_batches
+from .reranker import RerankEngine, create_rerank_engine
+from .vector_index import DEFAULT_INDEX, create_vector_index, create_query_options
+
+
+EXISTS_BATCH_SIZE = 5000
 
 
 class CategoryConfig:
@@ -28,114 +40,109 @@ class CategoryConfig:
 class VectorService(KBaseService):
     store: AsyncPGVectorStore = None
     config: VectorStoreConfig
-    documents: list[Document]
     categories: list[str]
-    _category_embeddings: Dict[str, List[float]] = {}
-    _embeddings: OpenAIEmbeddings | None = None
-
-    def __init__(self, config: VectorStoreConfig) -> None:
+    manifest: IngestManifest
+    changes: ManifestDiff
+    _category_index: CategoryIndex
+    _embeddings: OpenAIEmbeddings | CachedEmbeddings | None = None
+    _reranker: RerankEngine
+    last_timings: Dict[str, float] = {}
+
+    def __init__(self, config: VectorStoreConfig | MMapStoreConfig) -> None:
         self.config = config
-        self.documents, self.categories = self.load_documents()
-        self._compressor = CohereRerank(
-            top_n=self.config['topN'],
-            model=self.config['reRankModel']
-        )
-        # Get unique categories
-        self.unique_categories = list(set(self.categories))
-        # Initialize embeddings for category inference
-        self._embeddings = OpenAIEmbeddings(model=self.config['embedModel'])
-        self._category_embeddings = {}
+        # providers sharing this service (e.g. concurrent battles) must not create and ingest the store twice
+        self._store_lock = asyncio.Lock()
+        # self.store is assigned before ingestion runs, only hand it out once this is set
+        self._store_ready = False
+        self.manifest = IngestManifest(os.path.join(CACHE_DIR, f"{self.config['tableName']}.manifest.json"))
+
+        paths = self.discover_files()
+        self.changes = self.manifest.diff(paths)
+        print(f"Knowledge base {self.config['location']}: {len(self.changes.added)} new, "
+              f"{len(self.changes.modified)} modified, {len(self.changes.deleted)} deleted, "
+              f"{len(self.changes.unchanged)} unchanged files")
+
+        # without a Cohere model rerank locally
+        default_reranker = {'backend': 'cohere' if self.config.get('reRankModel') else 'bm25'}
+        self._reranker = create_rerank_engine(self.config.get('reranker', default_reranker),
+                                              self.config.get('reRankModel'), self.config['topN'])
+        # Initialize embeddings for ingestion, queries and category inference
+        self._embeddings = self._create_embeddings()
+        self._update_categories()
+
+    def _create_embeddings(self) -> OpenAIEmbeddings | CachedEmbeddings:
+        embeddings = OpenAIEmbeddings(model=self.config['embedModel'])
+        store = create_embedding_store(self.config.get('embeddingCache', {'backend': 'sqlite'}),
+                                       self.config['tableName'])
+
+        if not store:
+            return embeddings
+
+        return CachedEmbeddings(embeddings, self.config['embedModel'], store)
+
+    async def embed_query(self, request: str) -> list[float] | None:
+        return await self._embeddings.aembed_query(request)
 
-    def load_documents(self) -> tuple[list[Document], list[str]]:
-        loaded: list[Document] = []
+    def discover_files(self) -> list[str]:
         base = self.config['location']
-        categories: list[str] = []
-
-        for path in glob.glob(os.path.join(base, "**", "*"), recursive=True):
-            if os.path.isdir(path) or os.path.basename(path).startswith("."):
-                continue
-            ext = os.path.splitext(path)[1].lower()
-
-            relative_path = os.path.relpath(path, base)
-            category = relative_path.split(os.sep)[0] if os.sep in relative_path else "general"
-
-            try:
-                loaded_docs = []
-                if ext == ".md":
-                    for d in UnstructuredMarkdownLoader(path).load():
-                        loaded_docs.append(d)
-                elif ext == ".pdf":
-                    for d in PyMuPDFLoader(path).load():
-                        loaded_docs.append(d)
-                elif ext == ".docx":
-                    for d in UnstructuredWordDocumentLoader(path).load():
-                        loaded_docs.append(d)
-                elif ext == ".txt":
-                    for d in TextLoader(path).load():
-                        loaded_docs.append(d)
-                elif ext == '.csv':
-                    df = pd.read_csv(path)
-                    df = df.replace({np.nan: None})
-
-                    filename = os.path.basename(path)
-
-                    for row_num, (_, row) in enumerate(df.iterrows()):
-                        row_dict = row.to_dict()
-
-                        row_text = f"Record from {filename}:\n"
-                        row_text += "\n".join([
-                            f"{col}: {val}" for col, val in row_dict.items()
-                            if val is not None
-                        ])
-
-                        doc = Document(
-                            page_content=row_text,
-                            metadata={
-                                "source": path,
-                                "row_number": row_num,  # This is a proper int
-                                "csv_data": row_dict
-                            }
-                        )
-                        loaded_docs.append(doc)
-
-                for d in loaded_docs:
-                    d.metadata["category"] = category
-                    d.metadata['file_type'] = ext
-                    loaded.append(d)
-                    categories.append(category)
-            except Exception:
-                print(f"INGEST ERROR: failed to load {path}")
-                traceback.print_exc()
 
-        return loaded, categories
+        return [path for path in glob.glob(os.path.join(base, "**", "*"), recursive=True)
+                if not os.path.isdir(path) and not os.path.basename(path).startswith(".")
+                and os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS]
+
+    def _get_category(self, path: str) -> str:
+        relative_path = os.path.relpath(path, self.config['location'])
+        return relative_path.split(os.sep)[0] if os.sep in relative_path else "general"
+
+    def _update_categories(self) -> None:
+        """
+        Categories of the files the manifest records as having produced documents. A category without documents
+        would only ever filter a search down to nothing.
+        """
+        self.categories = [self._get_category(path) for path in self.manifest.sources()]
+        self.unique_categories = list(set(self.categories))
+
+        # keep an index that is already built when ingestion did not change the category set
+        if getattr(self, '_category_index', None) is None \
+                or self._category_index.categories != sorted(self.unique_categories):
+            self._category_index = CategoryIndex(self.unique_categories, self.config['embedModel'])
 
     async def get_vector_store(self) -> AsyncPGVectorStore | None:
-        if self.store:
+        if self._store_ready:
             return self.store
 
+        async with self._store_lock:
+            if not self._store_ready:
+                await self.__create_vector_store()
+                self._store_ready = True
+
+        return self.store
+
+    async def __create_vector_store(self) -> None:
         engine = PGEngine.from_connection_string(self.config['connectionStr'])
-        embeddings = OpenAIEmbeddings(model=self.config['embedModel'])
 
         self.store = await AsyncPGVectorStore.create(
             engine=engine,
-            embedding_service=embeddings,
+            embedding_service=self._embeddings,
             table_name=self.config['tableName'],
             metadata_json_column=self.config['metadataJsonColumn'],
             metadata_columns=self.config['metadataColumns'],
+            index_query_options=create_query_options(self.index_config),
         )
 
+        await self._create_document_id_index()
+        if 'hybridSearch' in self.config:
+            await self._create_lexical_index()
         await self.add_docs_to_store()
         await self._create_index()
 
-        return self.store
+    @property
+    def index_config(self) -> VectorIndexConfig:
+        return self.config.get('index', DEFAULT_INDEX)
 
     async def _create_index(self):
-        index = HNSWIndex(
-            name="hnsw_idx",
-            distance_strategy=DistanceStrategy.COSINE_DISTANCE,
-            m=16,
-            ef_construction=64
-        )
+        # an existing index keeps its build parameters, drop it (or run benchIndex) after changing them
+        index = create_vector_index(self.index_config)
         try:
             await self.store.aapply_vector_index(index, concurrently=True)
             print("Index created successfully")
@@ -149,154 +156,305 @@ class VectorService(KBaseService):
                 raise
 
     async def add_docs_to_store(self) -> list[str]:
-        store = await self.get_vector_store()
+        """
+        Stream new and modified files into the store: discover -> parse -> hash/dedupe -> embed -> write.
+        Work happens in batches of ingestBatchSize documents, so memory stays flat regardless of corpus size.
+        Runs while get_vector_store holds the store lock, so it uses self.store directly.
+        """
+        store = self.store
         document_id_key = 'document_id'
 
-        new_documents = []
         added_ids = []
 
-        for doc in self.documents:
-            # Check if document has an ID in metadata
-            doc_id = doc.metadata.get(document_id_key)
+        await self.remove_sources(self.changes.to_remove)
+        self.manifest.forget(self.changes.deleted)
+
+        to_ingest = self.changes.to_ingest
+        progress = IngestProgress(len(to_ingest))
+        workers = self.config.get('ingestWorkers', 1) or os.cpu_count() or 1
+        parsed = parse_files(((path, self._get_category(path)) for path in to_ingest),
+                             workers=workers, timeout=self.config.get('ingestTimeout'),
+                             chunk_tokens=self.config.get('chunkTokens'))
+
+        async for batch, completed in document_batches(parsed, self.config.get('ingestBatchSize', 256), progress):
+            for doc in batch:
+                # Check if document has an ID in metadata
+                if not doc.metadata.get(document_id_key):
+                    # Generate ID from source and content hash if not provided
+                    doc.metadata[document_id_key] = self._generate_doc_id(doc.metadata.get('source', ''),
+                                                                          doc.page_content)
+
+            # Resolve which documents already exist in bulk
+            existing_ids = await self.existing_document_ids([doc.metadata[document_id_key] for doc in batch])
+            new_documents = []
+
+            for doc in batch:
+                doc_id = doc.metadata[document_id_key]
+
+                if doc_id not in existing_ids:
+                    new_documents.append(doc)
+                    added_ids.append(doc_id)
+                    # the same chunk repeated within a file is a duplicate as well
+                    existing_ids.add(doc_id)
+
+            # Add only new documents
+            if new_documents:
+                texts = [doc.page_content for doc in new_documents]
+                embeddings = await self._embeddings.aembed_documents(texts)
+                progress.embeddings += len(embeddings)
+
+                await store.aadd_embeddings(texts, embeddings, metadatas=[doc.metadata for doc in new_documents])
+                progress.written += len(new_documents)
+
+            self.manifest.record(completed)
+            self.manifest.checkpoint()
+            progress.report()
+
+        self.manifest.save()
+        self._update_categories()
+
+        if added_ids or self.changes.to_remove:
+            self.generation += 1
+
+        if added_ids:
+            print(f"Added {len(added_ids)} new documents to vector store")
+        else:
+            print("All documents already exist in vector store")
 
-            if not doc_id:
-                # Generate ID from content hash if not provided
-                doc_id = self._generate_doc_id(doc.page_content)
-                doc.metadata[document_id_key] = doc_id
+        if isinstance(self._embeddings, CachedEmbeddings):
+            print(f"Embedding cache: {self._embeddings.stats()}")
 
-            # Check if document exists
-            if not await self.document_exists(doc_id):
-                new_documents.append(doc)
-                added_ids.append(doc_id)
+        return added_ids
 
-        self.documents = []
+    def _metadata_column(self, name: str) -> str:
+        if name in self.config['metadataColumns']:
+            return f'"{name}"'
 
-        # Add only new documents
-        if new_documents:
-            await store.aadd_documents(new_documents)
-            print(f"Added {len(new_documents)} new documents to vector store")
-        else:
-            print("All documents already exist in vector store")
+        return f'"{self.config["metadataJsonColumn"]}"->>\'{name}\''
 
-        return added_ids
+    async def remove_sources(self, sources: list[str]) -> None:
+        """Delete every vector that was ingested from one of the given files"""
+        if not sources:
+            return
+
+        query = (f'DELETE FROM "{self.store.schema_name}"."{self.store.table_name}" '
+                 f'WHERE {self._metadata_column("source")} = ANY(:sources)')
+
+        async with self.store.engine.connect() as conn:
+            result = await conn.execute(text(query), {"sources": sources})
+            await conn.commit()
 
-    def _generate_doc_id(self, content: str) -> str:
-        """Generate a unique ID based on content hash"""
-        return hashlib.md5(content.encode()).hexdigest()
+        print(f"Removed {result.rowcount} stale vectors from {len(sources)} deleted or modified files")
+
+    def _generate_doc_id(self, source: str, content: str) -> str:
+        """
+        Generate a unique ID from the source and content hash. The source is part of the ID so a chunk shared by two
+        files is stored once per file and removing one file never takes the other's copy with it. With an embedding
+        cache the shared content is still embedded once.
+        """
+        return hashlib.md5(f'{source}\0{content}'.encode()).hexdigest()
 
     async def _retrieve_and_rerank(
             self,
             query: str,
+            query_embedding: List[float],
             k: int = 5,
-            category: str | None = None
+            category: str | None = None,
+            timings: Dict[str, float] | None = None
     ) -> Union[list[Document], Sequence[Document]]:
         """
-        Retrieve documents and rerank them using Cohere.
+        Retrieve documents by the precomputed query embedding and rerank them with the configured reranker.
         Mimics the behavior of ContextualCompressionRetriever with CohereRerank.
         """
+        timings = timings if timings is not None else {}
+
         store = await self.get_vector_store()
         if not store:
             return []
 
+        # Initial retrieval from vector store, reusing the embedding from category inference
+        started = time.perf_counter()
+        if 'hybridSearch' in self.config:
+            initial_docs = await self._hybrid_search(query, query_embedding, k, category, timings)
+        else:
+            initial_docs = await self._dense_search(query_embedding, k, category)
+        timings['search'] = time.perf_counter() - started
+
+        if not initial_docs:
+            return []
+
+        # Apply reranking, skipped or served from cache when possible
+        started = time.perf_counter()
+        reranked_docs = await self._reranker.arerank(query, initial_docs)
+        timings['rerank'] = time.perf_counter() - started
+
+        return reranked_docs
+
+    async def _dense_search(self, query_embedding: List[float], k: int, category: str | None) -> list[Document]:
         # Build search kwargs
         search_kwargs = {"k": k}
         if category:
             search_kwargs["filter"] = {"category": category}
 
-        # Initial retrieval from vector store
-        initial_docs = await store.asimilarity_search(query, **search_kwargs)
+        return await self.store.asimilarity_search_by_vector(query_embedding, **search_kwargs)
 
-        if not initial_docs:
-            return []
+    async def _hybrid_search(self, query: str, query_embedding: List[float], k: int, category: str | None,
+                             timings: Dict[str, float]) -> list[Document]:
+        """
+        Run the dense and full-text legs concurrently and fuse them with reciprocal rank fusion.
+        Exact identifiers (SKUs, error codes) that embeddings blur are picked up by the lexical leg.
+        """
+        hybrid = self.config['hybridSearch']
+
+        async def timed(stage: str, leg):
+            started = time.perf_counter()
+            docs = await leg
+            timings[stage] = time.perf_counter() - started
+            return docs
+
+        dense_docs, lexical_docs = await asyncio.gather(
+            timed('dense', self._dense_search(query_embedding, hybrid.get('denseK', k), category)),
+            timed('lexical', self.lexical_search(query, hybrid.get('lexicalK', k), category))
+        )
 
-        # Apply reranking
-        if self._compressor:
-            # CohereRerank expects documents in a specific format
-            compressed_docs = await self._compressor.acompress_documents(
-                documents=initial_docs,
-                query=query
-            )
-            return compressed_docs
+        fused = reciprocal_rank_fusion([dense_docs, lexical_docs],
+                                       [hybrid.get('denseWeight', 1.0), hybrid.get('lexicalWeight', 1.0)],
+                                       hybrid.get('rrfK', DEFAULT_RRF_K))
+
+        return fused[:k]
+
+    def _lexical_language(self) -> str:
+        language = self.config.get('hybridSearch', {}).get('language', 'english')
+
+        # the language is part of the generated column's DDL, so it cannot be a bound parameter
+        if not re.fullmatch(r'\w+', language):
+            raise ValueError(f'invalid full text search language {language}')
+
+        return language
+
+    async def _create_lexical_index(self) -> None:
+        """Maintain a generated tsvector column over the document content and a GIN index on it"""
+        table = f'"{self.store.schema_name}"."{self.store.table_name}"'
+        queries = [
+            f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS content_tsv tsvector GENERATED ALWAYS AS '
+            f'(to_tsvector(\'{self._lexical_language()}\'::regconfig, "{self.store.content_column}")) STORED',
+            f'CREATE INDEX IF NOT EXISTS "{self.store.table_name}_content_tsv_idx" ON {table} USING GIN (content_tsv)'
+        ]
+
+        async with self.store.engine.connect() as conn:
+            for query in queries:
+                await conn.execute(text(query))
+            await conn.commit()
+
+    async def lexical_search(self, query: str, k: int, category: str | None = None) -> list[Document]:
+        """Full-text search over the content_tsv column, ranked by ts_rank_cd"""
+        store = self.store
+        metadata_columns = "".join(f', "{column}"' for column in self.config['metadataColumns'])
+        category_filter = f' AND {self._metadata_column("category")} = :category' if category else ''
+
+        sql = (f'SELECT "{store.id_column}", "{store.content_column}", "{self.config["metadataJsonColumn"]}"'
+               f'{metadata_columns} FROM "{store.schema_name}"."{store.table_name}", '
+               f'websearch_to_tsquery(CAST(:language AS regconfig), :query) AS q '
+               f'WHERE content_tsv @@ q{category_filter} '
+               f'ORDER BY ts_rank_cd(content_tsv, q) DESC LIMIT :k')
+        params = {"language": self._lexical_language(), "query": query, "k": k}
+        if category:
+            params["category"] = category
+
+        async with store.engine.connect() as conn:
+            rows = (await conn.execute(text(sql), params)).fetchall()
+
+        documents = []
+        for row in rows:
+            doc_id, content, metadata_json, *column_values = row
+            if isinstance(metadata_json, str):
+                metadata_json = json.loads(metadata_json)
 
-        return initial_docs
+            metadata = {**(metadata_json or {}), **dict(zip(self.config['metadataColumns'], column_values))}
+            documents.append(Document(id=str(doc_id), page_content=content, metadata=metadata))
+
+        return documents
 
     async def document_exists(self, document_id: str) -> bool:
         """Check if a document with given ID already exists"""
-        store = await self.get_vector_store()
+        await self.get_vector_store()
+        return document_id in await self.existing_document_ids([document_id])
 
-        # Search by metadata
-        results = await store.asimilarity_search(
-            query="",  # Empty query to just filter by metadata
-            k=1,
-            filter={"document_id": document_id}  # Fixed: was "document_id_key"
-        )
+    async def _create_document_id_index(self) -> None:
+        """Index the document_id metadata so existence checks are index lookups"""
+        query = (f'CREATE INDEX IF NOT EXISTS "{self.store.table_name}_document_id_idx" '
+                 f'ON "{self.store.schema_name}"."{self.store.table_name}" (({self._metadata_column("document_id")}))')
+
+        async with self.store.engine.connect() as conn:
+            await conn.execute(text(query))
+            await conn.commit()
+
+    async def existing_document_ids(self, document_ids: list[str]) -> set[str]:
+        """
+        Return the subset of document_ids already in the store.
+        Uses one indexed lookup per batch of EXISTS_BATCH_SIZE ids instead of a similarity search per document.
+        """
+        store = self.store
+        unique_ids = list(set(document_ids))
+        existing: set[str] = set()
+
+        if not unique_ids:
+            return existing
 
-        return len(results) > 0
+        column = self._metadata_column("document_id")
+        query = (f'SELECT DISTINCT {column} FROM "{store.schema_name}"."{store.table_name}" '
+                 f'WHERE {column} = ANY(:ids)')
+
+        async with store.engine.connect() as conn:
+            for start in range(0, len(unique_ids), EXISTS_BATCH_SIZE):
+                result = await conn.execute(text(query), {"ids": unique_ids[start:start + EXISTS_BATCH_SIZE]})
+                existing.update(row[0] for row in result)
+
+        return existing
 
     # ========== Category Inference Methods ==========
 
     async def _initialize_category_embeddings(self):
-        """Pre-compute embeddings for categories"""
-        if self._category_embeddings or not self._embeddings:
+        """Load or batch-compute the category embedding matrix"""
+        if not self._embeddings:
             return
 
-        for category in self.unique_categories:
-            # Create a representative description for each category
-            # You can customize this based on your needs
-            description = f"Documents and content related to {category}"
-            embedding = await self._embeddings.aembed_query(description)
-            self._category_embeddings[category] = embedding
+        await self._category_index.build(self._embeddings)
+
+    def _best_category(self, scores: np.ndarray) -> tuple[str | None, float]:
+        if not scores.size:
+            return None, 0.0
 
-    def _normalize_text(self, text: str) -> str:
-        """Normalize text for keyword matching"""
-        return re.sub(r'[^\w\s]', '', text.lower())
+        best = int(np.argmax(scores))
+        return self._category_index.categories[best], float(scores[best])
 
     def _infer_category_keyword(self, query: str, min_score: float = 0.3) -> Dict[str, Any]:
         """
         Keyword-based category inference.
-        Matches query against category names.
+        Matches query against the precomputed category names and token sets.
         """
         if not self.unique_categories:
             return {"category": None, "confidence": 0.0, "method": "keyword"}
 
-        query_normalized = self._normalize_text(query)
-        query_words = set(query_normalized.split())
+        scores = self._category_index.keyword_scores(query)
+        best_category, best_score = self._best_category(scores)
 
-        scores = {}
-        for category in self.unique_categories:
-            category_normalized = self._normalize_text(category)
-            category_words = set(category_normalized.split())
-
-            # Check for exact category name match
-            if category_normalized in query_normalized:
-                scores[category] = 1.0
-                continue
-
-            # Check for word overlap
-            matches = len(query_words & category_words)
-            if matches > 0:
-                # Score based on percentage of category words matched
-                scores[category] = matches / max(len(category_words), 1)
-            else:
-                scores[category] = 0.0
-
-        if not scores or max(scores.values()) < min_score:
+        if best_category is None or best_score < min_score:
             return {"category": None, "confidence": 0.0, "method": "keyword"}
 
-        best_category = max(scores, key=scores.get)
-        best_score = scores[best_category]
-
         return {
             "category": best_category,
             "confidence": best_score,
             "method": "keyword",
-            "all_scores": scores
+            "scores": scores
         }
 
-    async def _infer_category_embedding(self, query: str, min_similarity: float = 0.65) -> Dict[str, Any]:
+    async def _infer_category_embedding(self, query: str, min_similarity: float = 0.65,
+                                        query_embedding: List[float] | None = None) -> Dict[str, Any]:
         """
         Embedding-based category inference using cosine similarity.
-        Compares query embedding to category embeddings.
+        Scores the query against every category with one matrix-vector product, embedding the query only if it
+        was not passed in.
         """
         if not self._embeddings or not self.unique_categories:
             return {"category": None, "confidence": 0.0, "method": "embedding"}
@@ -304,24 +462,19 @@ class VectorService(KBaseService):
         # Initialize category embeddings if not done
         await self._initialize_category_embeddings()
 
-        if not self._category_embeddings:
+        if self._category_index.matrix is None:
             return {"category": None, "confidence": 0.0, "method": "embedding"}
 
         # Get query embedding
-        query_embedding = await self._embeddings.aembed_query(query)
+        if query_embedding is None:
+            query_embedding = await self._embeddings.aembed_query(query)
 
-        # Calculate cosine similarity with each category
-        similarities = {}
-        for cat_name, cat_embedding in self._category_embeddings.items():
-            similarity = self._cosine_similarity(query_embedding, cat_embedding)
-            similarities[cat_name] = similarity
+        similarities = self._category_index.embedding_scores(query_embedding)
+        best_category, best_similarity = self._best_category(similarities)
 
-        if not similarities:
+        if best_category is None:
             return {"category": None, "confidence": 0.0, "method": "embedding"}
 
-        best_category = max(similarities, key=similarities.get)
-        best_similarity = similarities[best_category]
-
         if best_similarity < min_similarity:
             return {"category": None, "confidence": best_similarity, "method": "embedding"}
 
@@ -329,29 +482,16 @@ class VectorService(KBaseService):
             "category": best_category,
             "confidence": best_similarity,
             "method": "embedding",
-            "all_scores": similarities
+            "scores": similarities
         }
 
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """Calculate cosine similarity between two vectors"""
-        vec1_np = np.array(vec1)
-        vec2_np = np.array(vec2)
-
-        dot_product = np.dot(vec1_np, vec2_np)
-        norm1 = np.linalg.norm(vec1_np)
-        norm2 = np.linalg.norm(vec2_np)
-
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-
-        return float(dot_product / (norm1 * norm2))
-
     async def _infer_category_hybrid(
             self,
             query: str,
             keyword_weight: float = 0.4,
             embedding_weight: float = 0.6,
-            min_confidence: float = 0.4
+            min_confidence: float = 0.4,
+            query_embedding: List[float] | None = None
     ) -> Dict[str, Any]:
         """
         Hybrid approach: combines keyword and embedding methods.
@@ -359,7 +499,8 @@ class VectorService(KBaseService):
         """
         # Get results from both methods
         keyword_result = self._infer_category_keyword(query, min_score=0.0)
-        embedding_result = await self._infer_category_embedding(query, min_similarity=0.0)
+        embedding_result = await self._infer_category_embedding(query, min_similarity=0.0,
+                                                                query_embedding=query_embedding)
 
         # If either method failed, fall back to the other
         if keyword_result['category'] is None and embedding_result['category'] is None:
@@ -371,27 +512,11 @@ class VectorService(KBaseService):
         if embedding_result['category'] is None:
             return {**keyword_result, "method": "hybrid-keyword-only"}
 
-        # Combine scores from both methods
-        combined_scores = {}
-        all_categories = set(keyword_result.get('all_scores', {}).keys()) | \
-                         set(embedding_result.get('all_scores', {}).keys())
-
-        for category in all_categories:
-            keyword_score = keyword_result.get('all_scores', {}).get(category, 0.0)
-            embedding_score = embedding_result.get('all_scores', {}).get(category, 0.0)
-
-            combined_scores[category] = (
-                    keyword_weight * keyword_score +
-                    embedding_weight * embedding_score
-            )
-
-        if not combined_scores:
-            return {"category": None, "confidence": 0.0, "method": "hybrid"}
-
-        best_category = max(combined_scores, key=combined_scores.get)
-        best_score = combined_scores[best_category]
+        # Combine scores from both methods, both are aligned with the category index
+        combined_scores = keyword_weight * keyword_result['scores'] + embedding_weight * embedding_result['scores']
+        best_category, best_score = self._best_category(combined_scores)
 
-        if best_score < min_confidence:
+        if best_category is None or best_score < min_confidence:
             return {"category": None, "confidence": best_score, "method": "hybrid"}
 
         return {
@@ -400,13 +525,14 @@ class VectorService(KBaseService):
             "method": "hybrid",
             "keyword_result": keyword_result,
             "embedding_result": embedding_result,
-            "all_scores": combined_scores
+            "scores": combined_scores
         }
 
     async def _infer_category(
             self,
             query: str,
-            method: str = "hybrid"  # Options: "keyword", "embedding", "hybrid"
+            method: str = "hybrid",  # Options: "keyword", "embedding", "hybrid"
+            query_embedding: List[float] | None = None
     ) -> str | None:
         """
         Main category inference method.
@@ -414,6 +540,7 @@ class VectorService(KBaseService):
         Args:
             query: The search query
             method: Inference method to use ("keyword", "embedding", or "hybrid")
+            query_embedding: Precomputed query embedding, reused instead of embedding the query again
 
         Returns:
             The inferred category name or None if no category matches
@@ -425,12 +552,12 @@ class VectorService(KBaseService):
             if method == "keyword":
                 result = self._infer_category_keyword(query)
             elif method == "embedding":
-                result = await self._infer_category_embedding(query)
+                result = await self._infer_category_embedding(query, query_embedding=query_embedding)
             elif method == "hybrid":
-                result = await self._infer_category_hybrid(query)
+                result = await self._infer_category_hybrid(query, query_embedding=query_embedding)
             else:
                 print(f"Unknown inference method: {method}, falling back to hybrid")
-                result = await self._infer_category_hybrid(query)
+                result = await self._infer_category_hybrid(query, query_embedding=query_embedding)
 
             category = result.get("category")
             confidence = result.get("confidence", 0.0)
@@ -448,18 +575,31 @@ class VectorService(KBaseService):
             traceback.print_exc()
             return None
 
-    async def load_context(self, query: str, k: int = 5, infer_category: bool = True) -> str:
+    async def load_context(self, query: str, embedding: list[float] | None = None, k: int = 5,
+                           infer_category: bool = True) -> str:
         """
         Retrieve relevant context from vector store
 
         Args:
             query: The search query
+            embedding: The query embedding when the caller already has it (e.g. the context cache)
             k: Number of documents to retrieve
             infer_category: Whether to infer and use category filtering
         """
+        timings: Dict[str, float] = {}
+        # categories are only known once ingestion recorded which files produced documents
+        await self.get_vector_store()
+        started = time.perf_counter()
+
+        # Embed the query once, it is shared by category inference and retrieval
+        query_embedding = embedding if embedding is not None else await self._embeddings.aembed_query(query)
+        timings['embed'] = time.perf_counter() - started
+
         category = None
         if infer_category:
-            category = await self._infer_category(query)
+            category_started = time.perf_counter()
+            category = await self._infer_category(query, query_embedding=query_embedding)
+            timings['category'] = time.perf_counter() - category_started
 
         if k is None:
             k = int(os.getenv("RETRIEVAL_K", "5"))
@@ -467,10 +607,16 @@ class VectorService(KBaseService):
         # Retrieve and rerank documents
         relevant_docs = await self._retrieve_and_rerank(
             query=query,
+            query_embedding=query_embedding,
             k=k,
-            category=category
+            category=category,
+            timings=timings
         )
 
+        timings['total'] = time.perf_counter() - started
+        self.last_timings = timings
+        print("Context timings: " + ", ".join(f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in timings.items()))
+
         if not relevant_docs:
             return "\n\n[No relevant context found in knowledge base]"
 